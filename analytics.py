@@ -0,0 +1,164 @@
+"""
+Screening analytics for ASTRA
+Dashboards read small pre-aggregated rollup collections instead of scanning
+responses / evaluated_responses:
+
+    rollup_daily  one document per day (_id "YYYY-MM-DD"): responses, evaluated,
+                  rating_sum/rating_count, latency_sum/latency_count,
+                  interviews_started, interviews_completed
+    rollup_tech   one document per technology (_id = tech): rating_sum, rating_count
+
+db_utils keeps them current with $inc on every write. `refresh` rebuilds them
+from the raw collections plus the answers compacted into interview_buckets
+(retention.py) with aggregation pipelines, for backfills or after changing
+what is rolled up:
+    python analytics.py refresh --since 2025-01-01
+    python analytics.py summary --days 30
+"""
+
+import argparse
+import json
+from datetime import datetime, timedelta
+
+from db_utils import (
+    daily_rollup_col,
+    evaluated_responses_col,
+    responses_col,
+    tech_rollup_col,
+)
+from metrics import traced
+from retention import compacted_answers
+
+
+def _avg(total, count, digits=2):
+    return round(total / count, digits) if count else None
+
+
+# ------------------ Refresh (backfill) ------------------
+def _day_expr():
+    return {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}
+
+def _answers(field, since):
+    """Pipeline prefix over one raw collection plus its compacted answers, from `since` on"""
+    if not since:
+        return [compacted_answers(field)]
+    since = datetime.fromisoformat(since)
+    match = {"$match": {"timestamp": {"$gte": since}}}
+    return [match, compacted_answers(field, {"ended": {"$gte": since}}), match]
+
+@traced("analytics.refresh")
+def refresh(since=None, tech=True):
+    """
+    Recompute the rollups from the raw collections and interview buckets.
+
+    Daily rollups are recomputed for days on/after `since` (a "YYYY-MM-DD"
+    string, default: all history); their interview counters are left alone as
+    they only exist in the rollup. Tech rollups are always fully recomputed.
+    Refreshed fields are overwritten, so increments that land while a refresh
+    runs can be lost; run it during a quiet period. Archived buckets are not
+    read: keep `since` within ASTRA_ARCHIVE_AFTER_DAYS, and only refresh tech
+    rollups (tech=True) while nothing has been archived yet.
+    """
+    is_number = {"$isNumber": "$latency_seconds"}
+    responses_col.aggregate(_answers("responses", since) + [
+        {"$group": {
+            "_id": _day_expr(),
+            "responses": {"$sum": 1},
+            "latency_sum": {"$sum": {"$cond": [is_number, "$latency_seconds", 0]}},
+            "latency_count": {"$sum": {"$cond": [is_number, 1, 0]}},
+        }},
+        {"$merge": {"into": daily_rollup_col.name, "whenMatched": "merge", "whenNotMatched": "insert"}},
+    ])
+
+    rated = {"$gt": ["$rating", 0]}
+    evaluated_responses_col.aggregate(_answers("evaluations", since) + [
+        {"$group": {
+            "_id": _day_expr(),
+            "evaluated": {"$sum": 1},
+            "rating_sum": {"$sum": {"$cond": [rated, "$rating", 0]}},
+            "rating_count": {"$sum": {"$cond": [rated, 1, 0]}},
+        }},
+        {"$merge": {"into": daily_rollup_col.name, "whenMatched": "merge", "whenNotMatched": "insert"}},
+    ])
+
+    if not tech:
+        return
+    # candidate_id is stored as a string; convert it to join on candidates._id
+    evaluated_responses_col.aggregate(_answers("evaluations", None) + [
+        {"$match": {"rating": {"$gt": 0}}},
+        {"$project": {"rating": 1, "cid": {"$convert": {
+            "input": "$candidate_id", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {"from": "candidates", "localField": "cid", "foreignField": "_id", "as": "candidate"}},
+        {"$unwind": "$candidate"},
+        {"$unwind": "$candidate.tech_stack"},
+        {"$group": {"_id": "$candidate.tech_stack", "rating_sum": {"$sum": "$rating"}, "rating_count": {"$sum": 1}}},
+        {"$merge": {"into": tech_rollup_col.name, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ])
+
+
+# ------------------ Queries ------------------
+def _daily_docs(days):
+    start = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    return list(daily_rollup_col.find({"_id": {"$gte": start}}).sort("_id", 1))
+
+@traced("analytics.daily_stats")
+def daily_stats(days=30, docs=None):
+    """Per-day stats for the last `days` days (oldest first)"""
+    rows = []
+    for doc in _daily_docs(days) if docs is None else docs:
+        started = doc.get("interviews_started", 0)
+        completed = doc.get("interviews_completed", 0)
+        rows.append({
+            "day": doc["_id"],
+            "interviews": started,
+            "completed": completed,
+            "completion_rate": _avg(completed, started, 3),
+            "responses": doc.get("responses", 0),
+            "avg_latency_seconds": _avg(doc.get("latency_sum", 0), doc.get("latency_count", 0), 1),
+            "evaluated": doc.get("evaluated", 0),
+            "avg_rating": _avg(doc.get("rating_sum", 0), doc.get("rating_count", 0)),
+        })
+    return rows
+
+@traced("analytics.tech_stats")
+def tech_stats(limit=20):
+    """Average rating per technology, most-rated first"""
+    cursor = tech_rollup_col.find().sort("rating_count", -1).limit(limit)
+    return [
+        {"tech": doc["_id"], "ratings": doc["rating_count"], "avg_rating": _avg(doc["rating_sum"], doc["rating_count"])}
+        for doc in cursor
+    ]
+
+def summary(days=30, tech_limit=20):
+    """Dashboard payload: totals over the window, per-day rows and per-tech ratings"""
+    docs = _daily_docs(days)
+
+    def total(field):
+        return sum(doc.get(field, 0) for doc in docs)
+
+    return {
+        "days": days,
+        "interviews": total("interviews_started"),
+        "completion_rate": _avg(total("interviews_completed"), total("interviews_started"), 3),
+        "avg_latency_seconds": _avg(total("latency_sum"), total("latency_count"), 1),
+        "avg_rating": _avg(total("rating_sum"), total("rating_count")),
+        "daily": daily_stats(days, docs),
+        "tech": tech_stats(tech_limit),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ASTRA screening analytics")
+    sub = ap.add_subparsers(dest="command", required=True)
+    rf = sub.add_parser("refresh", help="Rebuild the rollups from the raw collections")
+    rf.add_argument("--since", help="Only recompute daily rollups from this day (YYYY-MM-DD)")
+    rf.add_argument("--no-tech", action="store_true", help="Leave the per-technology rollups alone")
+    sm = sub.add_parser("summary", help="Print the dashboard summary")
+    sm.add_argument("--days", type=int, default=30)
+    args = ap.parse_args()
+
+    if args.command == "refresh":
+        refresh(args.since, tech=not args.no_tech)
+        print("Rollups refreshed.")
+    else:
+        print(json.dumps(summary(args.days), indent=2))
@@ -0,0 +1,220 @@
+"""
+HTTP API for ASTRA
+Exposes resume parsing, candidate storage, interview question generation and
+answer submission/evaluation without going through the Streamlit UI.
+
+Run locally with:
+    uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, conint
+
+from db_utils import (
+    get_candidate,
+    save_candidate_evaluated_response,
+    save_candidate_response,
+    upsert_candidate,
+)
+from analytics import summary as analytics_summary
+from exporter import COLLECTIONS, iter_records, start_id
+from helpers import extract_text_from_upload
+from ledger import BudgetExceeded, attribute, reassign, usage
+from llm_loader import router
+from metrics import render_prometheus
+from question_generator import (
+    evaluate_answer,
+    generate_job_questions,
+    generate_project_questions,
+    generate_tech_questions,
+)
+from resume_parser import PARSER_VERSION, CandidateData, parse_resume_to_json
+from resume_store import put_resume
+
+logger = logging.getLogger(__name__)
+
+# LLM calls allowed in flight per worker process; further requests wait here
+# instead of piling onto the provider. DB calls share the Mongo connection pool.
+LLM_CONCURRENCY = int(os.getenv("ASTRA_LLM_CONCURRENCY", "8"))
+_llm_slots = asyncio.Semaphore(LLM_CONCURRENCY)
+
+app = FastAPI(title="ASTRA API")
+
+
+# ------------------ Request bodies ------------------
+class InterviewPlanRequest(BaseModel):
+    job_role: str = "Software Engineer"
+
+class AnswerRequest(BaseModel):
+    question: str
+    answer: str
+    latency_seconds: Optional[float] = None
+
+class EvaluationRequest(BaseModel):
+    question: str
+    answer: str
+    rating: Optional[conint(ge=1, le=5)] = None
+
+
+# ------------------ Helpers ------------------
+async def _run_llm(func, *args):
+    """Run a blocking LLM-backed function in the threadpool, bounded by LLM_CONCURRENCY"""
+    async with _llm_slots:
+        return await run_in_threadpool(func, *args)
+
+async def _require_candidate(candidate_id: str) -> dict:
+    candidate = await run_in_threadpool(get_candidate, candidate_id)
+    if candidate is None:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    return candidate
+
+
+# ------------------ Endpoints ------------------
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for this worker (enable collection with ASTRA_METRICS=1)"""
+    return render_prometheus()
+
+@app.get("/routes")
+async def routes():
+    """Current model, SLO and recent p95 latency for each LLM task"""
+    return router.status()
+
+@app.post("/resumes/parse")
+async def parse_resume(file: UploadFile = File(...), save: bool = False):
+    """Extract text from an uploaded resume and parse it into CandidateData"""
+    raw = await file.read()
+    text = await run_in_threadpool(extract_text_from_upload, file.filename, raw, file.content_type)
+    sha = await run_in_threadpool(put_resume, raw, text)
+    if not text.strip():
+        raise HTTPException(status_code=422, detail="No text could be extracted from the file")
+
+    try:
+        with attribute(f"resume:{sha}"):
+            candidate = await _run_llm(parse_resume_to_json, text)
+    except BudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Resume could not be parsed: {e}")
+
+    result = {"candidate": candidate.model_dump()}
+    if save:
+        message, candidate_id = await run_in_threadpool(upsert_candidate, candidate, sha, PARSER_VERSION)
+        await run_in_threadpool(reassign, f"resume:{sha}", candidate_id)
+        result.update({"message": message, "candidate_id": candidate_id})
+    return result
+
+@app.put("/candidates")
+async def put_candidate(candidate: CandidateData):
+    """Insert or update a candidate keyed by email"""
+    message, candidate_id = await run_in_threadpool(upsert_candidate, candidate)
+    return {"message": message, "candidate_id": candidate_id}
+
+@app.get("/candidates/{candidate_id}")
+async def read_candidate(candidate_id: str):
+    return await _require_candidate(candidate_id)
+
+@app.post("/candidates/{candidate_id}/interview-plan")
+async def interview_plan(candidate_id: str, body: InterviewPlanRequest = InterviewPlanRequest()):
+    """
+    Generate the interview questions for a candidate.
+
+    The three question sections are generated concurrently and streamed back as
+    NDJSON lines ({"section": ..., "questions": [...]}) in the order they finish.
+    A section that fails is sent as {"section": ..., "error": ...} instead.
+    """
+    candidate = await _require_candidate(candidate_id)
+
+    async def section(name, func, arg):
+        # Set here rather than around the endpoint: sections run while the response streams
+        with attribute(candidate_id):
+            try:
+                return {"section": name, "questions": await _run_llm(func, arg)}
+            except Exception as e:
+                # Headers are already sent; report the failure in-band and keep streaming
+                logger.exception("Interview plan section %s failed for %s", name, candidate_id)
+                return {"section": name, "error": str(e) or type(e).__name__}
+
+    sections = [("job", generate_job_questions, body.job_role)]
+    if candidate.get("tech_stack"):
+        sections.append(("tech", generate_tech_questions, candidate))
+    if candidate.get("projects"):
+        sections.append(("project", generate_project_questions, candidate))
+
+    async def stream():
+        tasks = [asyncio.ensure_future(section(*args)) for args in sections]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield json.dumps(await finished) + "\n"
+        finally:
+            # Client went away mid-stream: don't leave sections running unobserved
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/candidates/{candidate_id}/answers")
+async def submit_answer(candidate_id: str, body: AnswerRequest):
+    await _require_candidate(candidate_id)
+    message = await run_in_threadpool(
+        save_candidate_response, candidate_id, body.question, body.answer, body.latency_seconds
+    )
+    return {"message": message}
+
+@app.post("/candidates/{candidate_id}/evaluations")
+async def submit_evaluation(candidate_id: str, body: EvaluationRequest):
+    """Store an evaluated answer; if no rating is given the LLM rates it"""
+    await _require_candidate(candidate_id)
+    rating = body.rating
+    if rating is None:
+        with attribute(candidate_id):
+            rating = await _run_llm(evaluate_answer, body.question, body.answer)
+    message = await run_in_threadpool(
+        save_candidate_evaluated_response, candidate_id, body.question, body.answer, rating
+    )
+    # 0 means the answer could not be rated (no usable model output or budget used up)
+    return {"message": message, "rating": rating or None, "rated": bool(rating)}
+
+@app.get("/candidates/{candidate_id}/usage")
+async def candidate_usage(candidate_id: str):
+    """LLM tokens, time and estimated cost spent on a candidate, per task"""
+    return await run_in_threadpool(usage, candidate_id)
+
+@app.get("/analytics/summary")
+async def analytics(days: int = 30):
+    """Dashboard stats read from the pre-aggregated rollups (see analytics.py)"""
+    return await run_in_threadpool(analytics_summary, days)
+
+@app.get("/export/{collection}")
+async def export_collection(collection: str, since: Optional[str] = None, since_id: Optional[str] = None):
+    """
+    Stream a collection as NDJSON (answers joined to their candidate's name and
+    email). Pass since (ISO timestamp, local time unless it has an offset) or
+    since_id (last _id seen) to export incrementally.
+    """
+    if collection not in COLLECTIONS:
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    # Validate before streaming: once the 200 headers are sent an error can only truncate the body
+    try:
+        start = start_id(since, since_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    def stream():
+        # Sync generator: Starlette iterates it in the threadpool, one cursor batch at a time
+        for batch in iter_records(collection, since_id=start):
+            yield "".join(json.dumps(doc, default=str) + "\n" for doc in batch)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
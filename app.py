@@ -1,12 +1,21 @@
 # app.py
+import json
+import logging
+import os
 import streamlit as st
 from db_utils import save_candidate
 from helpers import *
-from interview import start_interview
+from interview import start_interview, count_run
+from session_store import blob_key, blobs, session_id
+from job_queue import DONE, FAILED, QUEUED, RUNNING, get_job, job_status, owner_token, start_workers, submit_job
+
+logger = logging.getLogger(__name__)
 
 # ---------- Config ----------
 st.set_page_config(page_title="ASTRA-Applicant-Screening-Talent-Recruitment-Assistant", layout="centered")
 
+count_run("script")
+
 # ---------- UI ----------
 st.title("ASTRA-Applicant-Screening-Talent-Recruitment-Assistant")
 
@@ -23,71 +32,107 @@ if "candidate" not in st.session_state:
         "desired_positions": [],
         "tech_stack": []
     }
-if "raw_resume_text" not in st.session_state:
-    st.session_state.raw_resume_text = ""
-
 # Add a flag to track if candidate has been saved to DB
 if "candidate_saved_to_db" not in st.session_state:
     st.session_state.candidate_saved_to_db = False
 
+@st.cache_resource
+def _start_resume_workers():
+    """Start local resume parsing workers once per server (set ASTRA_JOB_WORKERS=0 to use external ones)"""
+    return start_workers(int(os.getenv("ASTRA_JOB_WORKERS", "2")))
+
+def _apply_resume_result(job_id, result):
+    """Load a finished parse job into the session (once per job)"""
+    st.session_state.resume_job_applied = job_id
+    # Large text goes to the shared blob store; the session keeps only the key
+    blobs.put(blob_key(st.session_state, "resume_text"), result["text"])
+    if result["candidate"] is None:
+        return
+    logger.info("save_candidate: %s", result["message"])
+
+    # Store in session state as a dictionary for consistency
+    st.session_state.candidate = result["candidate"]
+    st.session_state.candidate["_id"] = result["candidate_id"]
+    st.session_state.candidate_saved_to_db = True
+
+    # Get autofill data
+    autofill = autofill_fields_from_text(result["text"])
+
+    # Update the dictionary in session state directly
+    st.session_state.candidate.update({
+        "name": autofill["name"] if not st.session_state.candidate.get("name") else st.session_state.candidate["name"],
+        "email": autofill["email"] if not st.session_state.candidate.get("email") else st.session_state.candidate["email"],
+        "phone": autofill["phone"] if not st.session_state.candidate.get("phone") else st.session_state.candidate["phone"],
+        "location": autofill["location"] if not st.session_state.candidate.get("location") else st.session_state.candidate["location"],
+        "years_experience": autofill["years_experience"] if not st.session_state.candidate.get("years_experience") else st.session_state.candidate["years_experience"],
+        "tech_stack": autofill["tech_stack"] if not st.session_state.candidate.get("tech_stack") else st.session_state.candidate["tech_stack"]
+    })
+
+def _job_owner():
+    """This session's owner token for resume jobs"""
+    return owner_token(session_id(st.session_state))
+
+@st.fragment(run_every=2)
+def _poll_resume_job(job_id):
+    """Re-runs on its own every 2s until the job finishes, then reruns the whole app once"""
+    status = job_status(job_id, _job_owner())
+    if status in (QUEUED, RUNNING):
+        st.info(f"Parsing resume… ({status})")
+    else:
+        st.rerun()
+
+_start_resume_workers()
+
+# The job id in the URL lets a rerun pick the result back up, but only for the session
+# that submitted it: a shared or logged URL must not load someone else's parsed resume
+if "resume_job_id" not in st.session_state and "resume_job" in st.query_params:
+    if get_job(st.query_params["resume_job"], _job_owner()) is not None:
+        st.session_state.resume_job_id = st.query_params["resume_job"]
+    else:
+        del st.query_params["resume_job"]
+
 with st.expander("1. Upload resume (PDF / DOCX / TXT)", expanded=True): 
     st.subheader("Upload resume (PDF / DOCX / TXT)")
     uploaded = st.file_uploader("Choose a resume file", type=["pdf","docx","txt"])
     if uploaded is not None:
-        raw = uploaded.read()
-        st.session_state.raw_resume_text = "" # for debugging purposes only
-        parsed_text = ""
-        if uploaded.type == "application/pdf" or uploaded.name.lower().endswith(".pdf"):
-            if PyPDF2 is None:
-                st.warning("PyPDF2 not installed — install with `pip install PyPDF2` for PDF parsing. Falling back to raw bytes display.")
-            parsed_text = extract_text_from_pdf(raw) if PyPDF2 else ""
-        elif uploaded.name.lower().endswith(".docx"):
-            if docx is None:
-                st.warning("python-docx not installed — install with `pip install python-docx` for docx parsing.")
-            parsed_text = extract_text_from_docx(raw) if docx else ""
-        else:
-            parsed_text = extract_text_from_txt(raw)
-        st.session_state.raw_resume_text = parsed_text
+        if uploaded.name.lower().endswith(".pdf") and PyPDF2 is None:
+            st.warning("PyPDF2 not installed — install with `pip install PyPDF2` for PDF parsing.")
+        elif uploaded.name.lower().endswith(".docx") and docx is None:
+            st.warning("python-docx not installed — install with `pip install python-docx` for docx parsing.")
 
-        from resume_parser import parse_resume_to_json
-        from pydantic import ValidationError
+        # Queue each uploaded file once; extraction, parsing and saving happen in a worker
+        if st.session_state.get("resume_job_file") != uploaded.file_id:
+            job_id = submit_job(uploaded.name, uploaded.getvalue(), uploaded.type, owner=_job_owner())
+            st.session_state.resume_job_file = uploaded.file_id
+            st.session_state.resume_job_id = job_id
+            st.query_params["resume_job"] = job_id
 
-        # after extracting resume text
-        try:
-            # Parse the resume into a CandidateData object
-            candidate_data = parse_resume_to_json(parsed_text)
-            st.json(candidate_data.model_dump())
-            
-            # Save to MongoDB only if not already saved
-            if not st.session_state.candidate_saved_to_db:
-                result = save_candidate(candidate_data)
-                print(result)
-                st.session_state.candidate_saved_to_db = True
-            
-            # Store in session state as a dictionary for consistency
-            st.session_state.candidate = candidate_data.model_dump()
-            
-            if not parsed_text.strip():
+    job_id = st.session_state.get("resume_job_id")
+    if job_id:
+        if st.session_state.get("resume_job_applied") != job_id:
+            job = get_job(job_id, _job_owner())
+            if job is None:
+                st.warning("The previous resume upload has expired — please upload it again.")
+                del st.session_state.resume_job_id
+            elif job["status"] == DONE:
+                _apply_resume_result(job_id, job["result"])
+            elif job["status"] == FAILED:
+                logger.warning("Resume job %s failed: %s", job_id, job["error"])
+                st.error("The resume could not be parsed. Please try uploading it again, or fill in the fields below manually.")
+            else:
+                _poll_resume_job(job_id)
+
+        if st.session_state.get("resume_job_applied") == job_id:
+            parsed_text = blobs.get(blob_key(st.session_state, "resume_text"))
+            if parsed_text is None:
+                st.json(st.session_state.candidate)
+                st.caption("The parsed resume text has been released (interview finished or session idle).")
+            elif not parsed_text.strip():
                 st.info("No text was extracted — you can still paste resume text below or fill fields manually.")
             else:
+                st.json(st.session_state.candidate)
                 st.success("Parsed resume text")
                 st.text_area("Parsed resume", parsed_text, height=200)
-                
-                # Get autofill data
-                autofill = autofill_fields_from_text(parsed_text)
-                
-                # Update the dictionary in session state directly
-                st.session_state.candidate.update({
-                    "name": autofill["name"] if not st.session_state.candidate.get("name") else st.session_state.candidate["name"],
-                    "email": autofill["email"] if not st.session_state.candidate.get("email") else st.session_state.candidate["email"],
-                    "phone": autofill["phone"] if not st.session_state.candidate.get("phone") else st.session_state.candidate["phone"],
-                    "location": autofill["location"] if not st.session_state.candidate.get("location") else st.session_state.candidate["location"],
-                    "years_experience": autofill["years_experience"] if not st.session_state.candidate.get("years_experience") else st.session_state.candidate["years_experience"],
-                    "tech_stack": autofill["tech_stack"] if not st.session_state.candidate.get("tech_stack") else st.session_state.candidate["tech_stack"]
-                })
-
-        except ValidationError as ve:
-            st.error(f"Validation failed: {ve}")
     else:
         st.info("Upload a resume to try autofill. Or switch to Manual fill.")
 
@@ -144,7 +189,8 @@ with st.expander("2. Candidate details (review & edit)", expanded=False):
 
     # Export candidate JSON
     if st.button("Download candidate JSON"):
-        st.download_button("Download JSON", str(st.session_state.candidate), file_name="candidate.json")
+        st.download_button("Download JSON", json.dumps(st.session_state.candidate, default=str, indent=2),
+                           file_name="candidate.json", mime="application/json")
 
 st.write("---")
 with st.expander("3. Start technical interview", expanded=False):
@@ -0,0 +1,238 @@
+"""
+Offline benchmark suite for ASTRA
+Runs the hot paths (text extraction, autofill, resume parsing, question
+generation, response saves) against the fake LLM provider and the in-memory
+Mongo stand-in, and writes throughput and latency percentiles to a JSON
+baseline that can be compared across commits.
+
+Usage:
+    python benchmark.py --output bench_baseline.json
+    python benchmark.py --compare bench_baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+
+# Must be set before any ASTRA module is imported
+os.environ.setdefault("ASTRA_LLM_PROVIDER", "fake")
+os.environ.setdefault("ASTRA_DB_BACKEND", "memory")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def summarize(durations, errors, wall_time):
+    """Throughput and latency stats (milliseconds) for one case"""
+    durations = sorted(durations)
+    ms = [d * 1000.0 for d in durations]
+    return {
+        "iterations": len(durations) + errors,
+        "errors": errors,
+        "throughput_ops": round(len(durations) / wall_time, 2) if wall_time else 0.0,
+        "mean_ms": round(sum(ms) / len(ms), 4) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 4),
+        "p95_ms": round(percentile(ms, 95), 4),
+        "p99_ms": round(percentile(ms, 99), 4),
+    }
+
+def run_case(func, iterations, warmup=2):
+    """Call func() `iterations` times and summarize; exceptions count as errors"""
+    for _ in range(warmup):
+        try:
+            func()
+        except Exception:
+            pass
+    durations, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            errors += 1
+            continue
+        durations.append(time.perf_counter() - t0)
+    return summarize(durations, errors, time.perf_counter() - start)
+
+
+def build_cases(pdf_path=None):
+    """Return {case name: zero-arg callable} for every benchmark that can run here"""
+    import helpers
+    import db_utils
+    from resume_parser import CandidateData, parse_resume_to_json, resume_text as sample_resume
+    from question_generator import generate_tech_questions, generate_project_questions, generate_job_questions
+    from response_cache import question_cache
+
+    def uncached(func):
+        # Question generation is served from question_cache after the first call; clear
+        # it so these cases keep timing the LLM path (the *_cached cases time hits)
+        return lambda: (question_cache.clear(), func())[1]
+
+    # At most 2 techs / projects, so random.sample always picks the same ones and the
+    # *_cached cases hit one cache key (the full resume yields a new pair most calls)
+    cached_dict = {**candidate_dict, "tech_stack": candidate_dict["tech_stack"][:2],
+                   "projects": candidate_dict["projects"][:2]}
+
+    tech_questions = lambda: generate_tech_questions(candidate_dict)
+    project_questions = lambda: generate_project_questions(candidate_dict)
+    job_questions = lambda: generate_job_questions("Software Engineer")
+
+    sample_bytes = sample_resume.encode("utf-8")
+    candidate = parse_resume_to_json(sample_resume)
+    candidate_dict = candidate.model_dump()
+    _, candidate_id = db_utils.save_candidate(candidate)
+
+    cases = {
+        "extract_text_txt": lambda: helpers.extract_text_from_txt(sample_bytes),
+        "autofill_fields_from_text": lambda: helpers.autofill_fields_from_text(sample_resume),
+        "parse_resume_to_json": lambda: parse_resume_to_json(sample_resume),
+        "generate_tech_questions": uncached(tech_questions),
+        "generate_project_questions": uncached(project_questions),
+        "generate_job_questions": uncached(job_questions),
+        "generate_tech_questions_cached": lambda: generate_tech_questions(cached_dict),
+        "generate_project_questions_cached": lambda: generate_project_questions(cached_dict),
+        "generate_job_questions_cached": job_questions,
+        "save_candidate": lambda: db_utils.save_candidate(CandidateData(**candidate_dict)),
+        "save_candidate_response": lambda: db_utils.save_candidate_response(
+            candidate_id, "Benchmark question?", "Benchmark answer " * 20),
+    }
+
+    if helpers.docx is not None:
+        document = helpers.docx.Document()
+        for line in sample_resume.splitlines():
+            document.add_paragraph(line)
+        buffer = BytesIO()
+        document.save(buffer)
+        docx_bytes = buffer.getvalue()
+        cases["extract_text_docx"] = lambda: helpers.extract_text_from_docx(docx_bytes)
+
+    if pdf_path and helpers.PyPDF2 is not None:
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+        cases["extract_text_pdf"] = lambda: helpers.extract_text_from_pdf(pdf_bytes)
+
+    return cases
+
+def _fake_llm_traffic():
+    """(calls, prompt bytes sent) summed over every fake model created so far"""
+    from fake_llm import FakeLLM
+    from llm_loader import _llm_cache
+
+    calls = sent = 0
+    for llm in list(_llm_cache.values()):
+        if isinstance(llm, FakeLLM):
+            stats = llm.stats
+            calls += stats["calls"]
+            sent += stats["bytes_sent"]
+    return calls, sent
+
+def _cache_lookups():
+    """(hits, lookups) of the question cache so far"""
+    from response_cache import question_cache
+
+    stats = question_cache.stats()
+    hits = stats.get("hit", 0) + stats.get("similar_hit", 0)
+    return hits, hits + stats.get("miss", 0)
+
+def run_benchmarks(iterations, only=None, pdf_path=None):
+    cases = build_cases(pdf_path)
+    results = {}
+    for name, func in cases.items():
+        if only and name not in only:
+            continue
+        calls_before, sent_before = _fake_llm_traffic()
+        hits_before, lookups_before = _cache_lookups()
+        results[name] = run_case(func, iterations)
+        r = results[name]
+        calls, sent = _fake_llm_traffic()
+        if calls > calls_before:
+            r["prompt_bytes_per_call"] = round((sent - sent_before) / (calls - calls_before), 1)
+        if name.endswith("_cached"):
+            # Includes the warmup calls, which may miss
+            hits, lookups = _cache_lookups()
+            if lookups > lookups_before:
+                r["cache_hit_rate"] = round((hits - hits_before) / (lookups - lookups_before), 3)
+        print(f"{name:<34} {r['throughput_ops']:>10.1f} ops/s  p50 {r['p50_ms']:>9.3f} ms  "
+              f"p95 {r['p95_ms']:>9.3f} ms  p99 {r['p99_ms']:>9.3f} ms  errors {r['errors']}"
+              + (f"  {r['prompt_bytes_per_call']:.0f} B/call" if "prompt_bytes_per_call" in r else "")
+              + (f"  hit rate {r['cache_hit_rate']:.0%}" if "cache_hit_rate" in r else ""))
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def compare(baseline, current, threshold):
+    """Print per-case p50/p95 ratios and return the names of cases slower than 1 + threshold"""
+    regressions = []
+    for name, cur in current.items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if old[metric] <= 0:
+                continue
+            ratio = cur[metric] / old[metric]
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  <-- REGRESSION"
+                regressions.append(f"{name}.{metric}")
+            print(f"{name:<34} {metric}: {old[metric]:.3f} -> {cur[metric]:.3f} ms ({ratio:.2f}x){flag}")
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ASTRA offline benchmarks")
+    ap.add_argument("--iterations", type=int, default=50)
+    ap.add_argument("--only", nargs="*", help="Run only these cases")
+    ap.add_argument("--pdf", help="PDF file to use for the extract_text_pdf case")
+    ap.add_argument("--output", default="bench_baseline.json", help="Where to write results")
+    ap.add_argument("--compare", help="Baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before failing (0.2 = 20%%)")
+    args = ap.parse_args(argv)
+
+    # Load the baseline first: --compare and --output may point at the same file
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(args.iterations, args.only, args.pdf)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "iterations": args.iterations,
+            "fake_llm": {k: v for k, v in os.environ.items() if k.startswith("ASTRA_FAKE_")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
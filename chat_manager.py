@@ -1,19 +1,12 @@
-import os
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableSequence
 from langchain.memory import ConversationBufferMemory
-from langchain_google_genai import ChatGoogleGenerativeAI  # for Gemini
+from ledger import BudgetExceeded
+from llm_loader import invoke_task_chat
 
 load_dotenv()
 
-# Initialize LLM
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    temperature=0.2,
-    api_key=os.getenv("GOOGLE_API_KEY"),
-)
-
 # Memory to track chat history
 memory = ConversationBufferMemory(return_messages=True)
 
@@ -24,19 +17,18 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}")                            # new user message
 ])
 
-# Runnable sequence: prompt + llm
-chat_chain = prompt | llm
-
 def ask_llm(user_message: str):
     """Send message to LLM with memory and return reply"""
     history = memory.load_memory_variables({})["history"]
 
-    response = chat_chain.invoke({
-        "history": history,
-        "input": user_message
-    })
+    # Messages keep their roles; the "chat" route in llm_loader.ROUTES picks the model per call
+    messages = prompt.format_messages(history=history, input=user_message)
+    try:
+        reply = invoke_task_chat("chat", messages)
+    except BudgetExceeded:
+        return "Sorry, the assistant is unavailable right now. Please continue with the interview."
 
     # Save new interaction
-    memory.save_context({"input": user_message}, {"output": response.content})
+    memory.save_context({"input": user_message}, {"output": reply})
 
-    return response.content
+    return reply
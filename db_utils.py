@@ -1,44 +1,221 @@
 # db_utils.py
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from bson import ObjectId
+import hashlib
+import json
 import os
 import re
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
 from datetime import datetime
+from metrics import traced
 
 load_dotenv()
 
 mongo_uri = os.getenv("MONGODB_URI")
-client = MongoClient(mongo_uri)
+if os.getenv("ASTRA_DB_BACKEND") == "memory":
+    # In-process Mongo stand-in for benchmarks and load tests (pip install mongomock)
+    import mongomock
+    client = mongomock.MongoClient()
+else:
+    # One pooled client per process; the pool is shared by the Streamlit app and the HTTP API threads
+    client = MongoClient(
+        mongo_uri,
+        maxPoolSize=int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+        minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+    )
 db = client["Astra"]
 candidates_col = db["candidates"]
 responses_col = db["responses"]
 evaluated_responses_col = db["evaluated_responses"]
+# Materialized analytics (see analytics.py), kept current by the writes below
+daily_rollup_col = db["rollup_daily"]
+tech_rollup_col = db["rollup_tech"]
+# Finished interviews compacted into one document each (see retention.py)
+interview_buckets_col = db["interview_buckets"]
+# Per-call LLM token / cost entries (see ledger.py)
+llm_ledger_col = db["llm_ledger"]
 
-def save_candidate(candidate):
+def _resume_fields(resume_sha256, parser_version):
+    """Stored-resume reference fields (see resume_store), omitting unset ones"""
+    fields = {"resume_sha256": resume_sha256, "parser_version": parser_version}
+    return {k: v for k, v in fields.items() if v is not None}
+
+def _field_hash(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+def _parsed_doc(candidate):
+    """A new candidate document from a parse, with parsed_hashes recording what the parser produced"""
+    data = candidate.model_dump()
+    return {**data, "parsed_hashes": {field: _field_hash(value) for field, value in data.items()}}
+
+def parsed_update(existing, candidate):
+    """
+    $set for storing a fresh parse over an existing candidate document.
+
+    email is the lookup key and is never rewritten. Fields edited since the
+    last parse (their value no longer matches parsed_hashes) are kept;
+    documents from before parsed_hashes existed are overwritten.
+    """
+    hashes = existing.get("parsed_hashes")
+    update = {}
+    for field, value in candidate.model_dump().items():
+        if field == "email":
+            continue
+        if hashes is not None and field in hashes and _field_hash(existing.get(field)) != hashes[field]:
+            continue  # edited by hand after parsing
+        update[field] = value
+        update[f"parsed_hashes.{field}"] = _field_hash(value)
+    return update
+
+@traced("db.save_candidate")
+def save_candidate(candidate, resume_sha256=None, parser_version=None):
     """
     Saves a CandidateData object into MongoDB and returns the document ID.
+    
+    resume_sha256 / parser_version link the candidate to its stored resume
+    (resume_store) and the parser that produced it. When they are given for an
+    existing candidate, the parsed fields are updated too (see parsed_update:
+    email and hand-edited fields are kept).
     """
-    if candidates_col.find_one({"email": candidate.email}):
-        # Return existing candidate ID
-        existing = candidates_col.find_one({"email": candidate.email})
+    resume_fields = _resume_fields(resume_sha256, parser_version)
+    existing = candidates_col.find_one({"email": candidate.email}, projection=None if resume_fields else {"_id": 1})
+    if existing:
+        # Return existing candidate ID, updated from the latest stored resume
+        if resume_fields:
+            candidates_col.update_one(
+                {"_id": existing["_id"]}, {"$set": {**parsed_update(existing, candidate), **resume_fields}}
+            )
+            _forget_candidate_tech(str(existing["_id"]))
+            return "Candidate updated from new resume.", str(existing["_id"])
         return "Candidate already exists in DB.", str(existing["_id"])
     else:
         # Insert and return new ID
-        result = candidates_col.insert_one(candidate.dict())
+        result = candidates_col.insert_one({**_parsed_doc(candidate), **resume_fields})
         return "Candidate saved to MongoDB.", str(result.inserted_id)
 
-def save_candidate_response(candidate_id, question, answer):
+@traced("db.upsert_candidate")
+def upsert_candidate(candidate, resume_sha256=None, parser_version=None):
+    """
+    Inserts or updates a CandidateData object keyed by email and returns the document ID.
+
+    With resume_sha256 / parser_version the candidate is a fresh parse and is
+    stored like save_candidate does (hand-edited fields kept); otherwise it is
+    a manual edit and every field is written.
+    """
+    if _resume_fields(resume_sha256, parser_version):
+        return save_candidate(candidate, resume_sha256, parser_version)
+    doc = candidates_col.find_one_and_update(
+        {"email": candidate.email},
+        {"$set": candidate.model_dump()},
+        upsert=True,
+        projection={"_id": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    _forget_candidate_tech(str(doc["_id"]))
+    return "Candidate upserted.", str(doc["_id"])
+
+def get_candidate(candidate_id):
+    """
+    Returns the candidate document for an ID (with a string _id), or None.
+    """
+    try:
+        doc = candidates_col.find_one({"_id": ObjectId(candidate_id)})
+    except Exception:
+        return None
+    if doc:
+        doc["_id"] = str(doc["_id"])
+    return doc
+
+# ------------------ Rollups ------------------
+def _day(timestamp):
+    return timestamp.strftime("%Y-%m-%d")
+
+# candidate_id -> (tech stack, time cached). Writes in this process invalidate
+# their entry; the TTL bounds staleness after writes from other processes.
+_tech_cache = OrderedDict()
+_tech_lock = threading.Lock()
+TECH_CACHE_SIZE = 4096
+TECH_CACHE_SECONDS = 300
+
+def _candidate_tech(candidate_id):
+    """A candidate's tech stack, cached so rating rollups don't re-read the candidate"""
+    with _tech_lock:
+        entry = _tech_cache.get(candidate_id)
+        if entry is not None and time.monotonic() - entry[1] < TECH_CACHE_SECONDS:
+            _tech_cache.move_to_end(candidate_id)
+            return entry[0]
+    try:
+        doc = candidates_col.find_one({"_id": ObjectId(candidate_id)}, projection={"tech_stack": 1})
+    except Exception:
+        return ()
+    if doc is None:
+        # Not cached: the candidate may just not be visible yet
+        return ()
+    tech = tuple(doc.get("tech_stack") or ())
+    with _tech_lock:
+        _tech_cache[candidate_id] = (tech, time.monotonic())
+        _tech_cache.move_to_end(candidate_id)
+        while len(_tech_cache) > TECH_CACHE_SIZE:
+            _tech_cache.popitem(last=False)
+    return tech
+
+def _forget_candidate_tech(candidate_id):
+    with _tech_lock:
+        _tech_cache.pop(candidate_id, None)
+
+def _rollup_response(timestamp, latency_seconds):
+    inc = {"responses": 1}
+    if latency_seconds is not None:
+        inc.update(latency_sum=latency_seconds, latency_count=1)
+    daily_rollup_col.update_one({"_id": _day(timestamp)}, {"$inc": inc}, upsert=True)
+
+def _rollup_evaluation(candidate_id, rating, timestamp):
+    inc = {"evaluated": 1}
+    if rating:  # 0 means the model gave no usable rating
+        inc.update(rating_sum=rating, rating_count=1)
+    daily_rollup_col.update_one({"_id": _day(timestamp)}, {"$inc": inc}, upsert=True)
+    if rating:
+        ops = [UpdateOne({"_id": tech}, {"$inc": {"rating_sum": rating, "rating_count": 1}}, upsert=True)
+               for tech in _candidate_tech(str(candidate_id))]
+        if ops:
+            tech_rollup_col.bulk_write(ops, ordered=False)
+
+@traced("db.record_interview_event")
+def record_interview_event(event, timestamp=None):
+    """
+    Count an interview "started" or "completed" in today's rollup
+    (interviews per day and completion rate come from these counters)
+    """
+    if event not in ("started", "completed"):
+        raise ValueError(f"Unknown interview event {event!r}")
+    timestamp = timestamp or datetime.now()
+    daily_rollup_col.update_one({"_id": _day(timestamp)}, {"$inc": {f"interviews_{event}": 1}}, upsert=True)
+
+
+@traced("db.save_candidate_response")
+def save_candidate_response(candidate_id, question, answer, latency_seconds=None):
     """
     Saves a candidate's response to a question (without evaluation)
+    
+    latency_seconds is how long the candidate took to answer, if known.
     """
-    responses_col.insert_one({
+    timestamp = datetime.now()
+    doc = {
         "candidate_id": candidate_id,
         "question": question,
         "answer": answer,
-        "timestamp": datetime.now()
-    })
+        "timestamp": timestamp
+    }
+    if latency_seconds is not None:
+        doc["latency_seconds"] = round(float(latency_seconds), 3)
+    responses_col.insert_one(doc)
+    _rollup_response(timestamp, doc.get("latency_seconds"))
     return "Response saved."
 
+@traced("db.save_candidate_evaluated_response")
 def save_candidate_evaluated_response(candidate_id, question, answer, rating, timestamp=None):
     """
     Saves a candidate's response along with its LLM evaluation
@@ -47,7 +224,7 @@ def save_candidate_evaluated_response(candidate_id, question, answer, rating, ti
         candidate_id: The candidate's ID
         question: The interview question
         answer: The candidate's answer
-        rating: Numerical rating (1-5)
+        rating: Numerical rating (1-5); 0 or None stores the answer unrated
         timestamp: Optional timestamp (defaults to current time)
     
     Returns:
@@ -61,10 +238,11 @@ def save_candidate_evaluated_response(candidate_id, question, answer, rating, ti
         except ValueError:
             timestamp = datetime.now()
             
-    # Ensure rating is within bounds
+    # Ensure rating is within bounds; unrated answers (no usable rating, budget
+    # used up) stay 0 instead of being clamped to a 1-star rating
     try:
         rating = int(rating)
-        rating = max(1, min(5, rating))
+        rating = max(1, min(5, rating)) if rating > 0 else 0
     except (ValueError, TypeError):
         rating = 0
         
@@ -73,7 +251,29 @@ def save_candidate_evaluated_response(candidate_id, question, answer, rating, ti
         "question": question,
         "answer": answer,
         "rating": rating,
+        "rated": rating > 0,
         "timestamp": timestamp
     })
+    _rollup_evaluation(candidate_id, rating, timestamp)
+    # The raw copy of this answer is now redundant; flag it for the TTL index (retention.py)
+    responses_col.update_one(
+        {"candidate_id": candidate_id, "question": question, "evaluated": {"$ne": True}},
+        {"$set": {"evaluated": True}},
+    )
     
-    return "Evaluated response saved."
+    return "Evaluated response saved." if rating else "Response saved unrated."
+
+@traced("db.get_candidate_responses")
+def get_candidate_responses(candidate_id):
+    """
+    All of a candidate's answers, oldest first: compacted interview buckets
+    followed by raw responses not yet compacted. Both reads use candidate_id indexes.
+    """
+    answers = []
+    buckets = interview_buckets_col.find({"candidate_id": candidate_id}, projection={"responses._id": 0})
+    for bucket in buckets.sort("started", 1):
+        answers.extend(bucket["responses"])
+    answers.extend(responses_col.find(
+        {"candidate_id": candidate_id}, projection={"_id": 0, "candidate_id": 0}
+    ).sort("timestamp", 1))
+    return answers
@@ -0,0 +1,238 @@
+"""
+Exporter for ASTRA
+Streams the candidates, responses and evaluated_responses collections to
+NDJSON or Parquet in constant memory: documents are read through batched
+cursors with projections, answers are joined to their candidate on
+candidate_id one batch at a time, and each batch is written out before the
+next is fetched.
+
+Exports are incremental: pass --since (a timestamp) or --since-id (the last
+_id of a previous export) to only export documents inserted after it. A
+--since without a UTC offset is read as local time, like the stored
+timestamps. Answers
+compacted into interview_buckets (retention.py) keep their _id and are
+exported in _id order with the rest.
+
+Usage:
+    python exporter.py responses --format ndjson --output responses.ndjson
+    python exporter.py evaluated_responses --format parquet --output evals.parquet --since 2025-01-01
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+
+from db_utils import candidates_col, evaluated_responses_col, responses_col
+from metrics import inc, traced
+from retention import compacted_answers
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+BATCH_SIZE = 1000
+
+# Collection -> (collection, projection); fields outside the projection are never fetched
+CANDIDATE_FIELDS = ["name", "email", "phone", "location", "years_experience", "tech_stack",
+                    "desired_positions", "projects", "resume_sha256", "parser_version"]
+RESPONSE_FIELDS = ["candidate_id", "question", "answer", "timestamp"]
+COLLECTIONS = {
+    "candidates": (candidates_col, CANDIDATE_FIELDS),
+    "responses": (responses_col, RESPONSE_FIELDS),
+    "evaluated_responses": (evaluated_responses_col, RESPONSE_FIELDS + ["rating", "rated"]),
+}
+# Bucket field holding each answer collection's compacted documents
+BUCKET_FIELDS = {"responses": "responses", "evaluated_responses": "evaluations"}
+# Candidate fields copied onto each exported answer
+JOIN_FIELDS = ["name", "email"]
+
+
+# ------------------ Reading ------------------
+def _to_object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+def start_id(since=None, since_id=None):
+    """
+    Lowest _id to export after: an explicit _id wins over a timestamp.
+    Raises ValueError for an invalid _id or timestamp.
+    """
+    if since_id:
+        start = _to_object_id(since_id)
+        if start is None:
+            raise ValueError(f"Invalid since_id {since_id!r}: expected a 24-character hex ObjectId")
+        return start
+    if since:
+        if isinstance(since, str):
+            since = datetime.fromisoformat(since)
+        if since.tzinfo is None:
+            # Stored timestamps are naive local time, but from_datetime reads naive values as UTC
+            since = since.astimezone()
+        # ObjectIds start with their insertion time, so one index covers both modes
+        return ObjectId.from_datetime(since)
+    return None
+
+def iter_batches(collection, since=None, since_id=None, batch_size=BATCH_SIZE):
+    """Yield lists of raw documents from `collection` in _id order"""
+    col, fields = COLLECTIONS[collection]
+    start = start_id(since, since_id)
+    query = {"_id": {"$gt": start}} if start is not None else {}
+    if collection in BUCKET_FIELDS:
+        # Raw answers plus those compacted since the last export, merged in _id order
+        bucket_match = {"last_id": {"$gt": start}} if start is not None else None
+        cursor = col.aggregate([
+            {"$match": query},
+            compacted_answers(BUCKET_FIELDS[collection], bucket_match),
+            {"$match": query},
+            {"$sort": {"_id": 1}},
+            {"$project": {field: 1 for field in fields}},
+        ], allowDiskUse=True, batchSize=batch_size)
+    else:
+        cursor = col.find(query, projection=fields, batch_size=batch_size).sort("_id", 1)
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _join_candidates(batch):
+    """Copy JOIN_FIELDS from each answer's candidate, one lookup per batch"""
+    ids = {_to_object_id(doc.get("candidate_id")) for doc in batch}
+    ids.discard(None)
+    found = {}
+    if ids:
+        for c in candidates_col.find({"_id": {"$in": list(ids)}}, projection=JOIN_FIELDS):
+            found[str(c["_id"])] = c
+    for doc in batch:
+        candidate = found.get(str(doc.get("candidate_id")), {})
+        for field in JOIN_FIELDS:
+            doc[f"candidate_{field}"] = candidate.get(field)
+    return batch
+
+def _clean(doc):
+    """Make a document JSON/Arrow friendly (ObjectIds become strings)"""
+    doc["_id"] = str(doc["_id"])
+    if "candidate_id" in doc:
+        doc["candidate_id"] = str(doc["candidate_id"]) if doc["candidate_id"] is not None else None
+    return doc
+
+def iter_records(collection, since=None, since_id=None, batch_size=BATCH_SIZE):
+    """Yield batches of export-ready records (answers joined to their candidate)"""
+    for batch in iter_batches(collection, since, since_id, batch_size):
+        if collection != "candidates":
+            batch = _join_candidates(batch)
+        yield [_clean(doc) for doc in batch]
+
+
+# ------------------ Writing ------------------
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def write_ndjson(batches, out):
+    """Write record batches to a text file object, one JSON document per line"""
+    count, last_id = 0, None
+    for batch in batches:
+        out.write("".join(json.dumps(doc, default=_json_default) + "\n" for doc in batch))
+        count += len(batch)
+        last_id = batch[-1]["_id"]
+    return count, last_id
+
+def _project_type():
+    return pa.struct([
+        ("name", pa.string()),
+        ("description", pa.string()),
+        ("technologies", pa.list_(pa.string())),
+    ])
+
+def parquet_schema(collection):
+    """Explicit Arrow schema, so a batch with missing or null fields can't change column types"""
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    if collection == "candidates":
+        return pa.schema([
+            ("_id", pa.string()),
+            ("name", pa.string()),
+            ("email", pa.string()),
+            ("phone", pa.string()),
+            ("location", pa.string()),
+            ("years_experience", pa.int64()),
+            ("tech_stack", pa.list_(pa.string())),
+            ("desired_positions", pa.list_(pa.string())),
+            ("projects", pa.list_(_project_type())),
+            ("resume_sha256", pa.string()),
+            ("parser_version", pa.string()),
+        ])
+    fields = [
+        ("_id", pa.string()),
+        ("candidate_id", pa.string()),
+        ("candidate_name", pa.string()),
+        ("candidate_email", pa.string()),
+        ("question", pa.string()),
+        ("answer", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+    ]
+    if collection == "evaluated_responses":
+        fields += [("rating", pa.int64()), ("rated", pa.bool_())]
+    return pa.schema(fields)
+
+def write_parquet(batches, path, collection):
+    """Write record batches to a Parquet file, one row group per batch"""
+    schema = parquet_schema(collection)
+    count, last_id = 0, None
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            count += len(batch)
+            last_id = batch[-1]["_id"]
+    return count, last_id
+
+@traced("export")
+def export(collection, fmt="ndjson", output="-", since=None, since_id=None, batch_size=BATCH_SIZE):
+    """
+    Export one collection. Returns (documents written, last _id) — pass the
+    last _id as since_id next time to continue where this export stopped.
+    """
+    if collection not in COLLECTIONS:
+        raise ValueError(f"Unknown collection {collection!r}; expected one of {', '.join(COLLECTIONS)}")
+    # Resolve the cursor up front so a bad --since / --since-id fails before any output
+    batches = iter_records(collection, since_id=start_id(since, since_id), batch_size=batch_size)
+    if fmt == "parquet":
+        if output == "-":
+            raise ValueError("Parquet export needs an --output file")
+        count, last_id = write_parquet(batches, output, collection)
+    elif output == "-":
+        count, last_id = write_ndjson(batches, sys.stdout)
+    else:
+        with open(output, "w", encoding="utf-8") as f:
+            count, last_id = write_ndjson(batches, f)
+    inc("astra_export_documents_total", count, collection=collection, format=fmt)
+    return count, last_id
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ASTRA bulk export")
+    ap.add_argument("collection", choices=list(COLLECTIONS))
+    ap.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    ap.add_argument("--output", default="-", help="Output file ('-' for stdout, NDJSON only)")
+    ap.add_argument("--since", help="Only documents inserted after this ISO timestamp (local time unless it has an offset)")
+    ap.add_argument("--since-id", help="Only documents after this _id (the last _id of a previous export)")
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = ap.parse_args()
+
+    try:
+        count, last_id = export(args.collection, args.format, args.output, args.since, args.since_id, args.batch_size)
+    except ValueError as e:
+        ap.error(str(e))
+    print(f"Exported {count} {args.collection} document(s); next run: --since-id {last_id or args.since_id or ''}",
+          file=sys.stderr)
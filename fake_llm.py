@@ -0,0 +1,218 @@
+# fake_llm.py
+"""
+Deterministic offline LLM for benchmarks and load tests.
+
+Answers are derived from the prompt alone (so the same prompt always gets the
+same answer); latency, token rate and error injection are configurable so the
+rest of the pipeline can be measured without provider credentials.
+
+It also mimics provider-side context caching: a system_prompt is sent in full
+on the first call and only referenced afterwards, and every call records the
+bytes it sent, so prompt-size changes can be checked offline.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, List, Mapping, Optional
+
+from langchain.llms.base import LLM
+from pydantic import PrivateAttr
+
+from helpers import autofill_fields_from_text
+from ledger import estimate_tokens
+from metrics import inc, span
+
+
+class FakeLLMError(RuntimeError):
+    """Raised by FakeLLM when an injected error fires"""
+
+
+class FakeLLM(LLM):
+    """
+    A LangChain-compatible fake model.
+
+    latency_ms / latency_dist control time to first token ("fixed", "uniform" in
+    [0, 2*latency_ms] or "lognormal" with latency_sigma), prefill_tokens_per_second
+    adds time to first token per prompt token sent and tokens_per_second adds
+    generation time per completion token (0 disables either). error_rate is the
+    probability that a call raises FakeLLMError.
+
+    system_prompt is a static prefix for every call; with context_cache it
+    is only sent (and prefilled) once.
+    """
+    model_name: str = "fake"
+    latency_ms: float = 0.0
+    latency_dist: str = "fixed"
+    latency_sigma: float = 0.5
+    tokens_per_second: float = 0.0
+    prefill_tokens_per_second: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+    system_prompt: Optional[str] = None
+    context_cache: bool = True
+
+    _rng: random.Random = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _cached_prefixes: set = PrivateAttr(default_factory=set)
+    _stats: dict = PrivateAttr(default_factory=lambda: {
+        "calls": 0, "errors": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+        "bytes_sent": 0, "cached_bytes": 0, "last_bytes_sent": 0,
+    })
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def stats(self) -> dict:
+        """Call and token counters since creation"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _sample_delay(self) -> float:
+        """Seconds to wait before the first token"""
+        if self.latency_ms <= 0:
+            return 0.0
+        with self._lock:
+            if self.latency_dist == "uniform":
+                ms = self._rng.uniform(0, 2 * self.latency_ms)
+            elif self.latency_dist == "lognormal":
+                # Parameterised so the median is latency_ms
+                ms = self._rng.lognormvariate(math.log(self.latency_ms), self.latency_sigma)
+            else:
+                ms = self.latency_ms
+        return ms / 1000.0
+
+    def _should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def _request_payload(self, prompt: str):
+        """(text sent to the "provider", text served from its context cache)"""
+        if not self.system_prompt:
+            return prompt, ""
+        if not self.context_cache:
+            return f"{self.system_prompt}\n\n{prompt}", ""
+        key = hashlib.sha256(self.system_prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = key in self._cached_prefixes
+            self._cached_prefixes.add(key)
+        if cached:
+            return prompt, self.system_prompt
+        return f"{self.system_prompt}\n\n{prompt}", ""
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        """
+        Returns a canned answer shaped like the real model's output for this prompt.
+        """
+        full_prompt = f"{self.system_prompt}\n\n{prompt}" if self.system_prompt else prompt
+        text = fake_response(full_prompt)
+        sent, cached = self._request_payload(prompt)
+        bytes_sent = len(sent.encode("utf-8"))
+        cached_bytes = len(cached.encode("utf-8"))
+        prompt_tokens = estimate_tokens(sent)
+        cached_tokens = estimate_tokens(cached)
+        completion_tokens = estimate_tokens(text)
+
+        with span("llm_call", provider="fake", model=self.model_name):
+            delay = self._sample_delay()
+            if self.prefill_tokens_per_second > 0:
+                delay += prompt_tokens / self.prefill_tokens_per_second
+            if self.tokens_per_second > 0:
+                delay += completion_tokens / self.tokens_per_second
+            if delay:
+                time.sleep(delay)
+
+            failed = self._should_fail()
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["prompt_tokens"] += prompt_tokens
+                self._stats["cached_tokens"] += cached_tokens
+                self._stats["bytes_sent"] += bytes_sent
+                self._stats["cached_bytes"] += cached_bytes
+                self._stats["last_bytes_sent"] = bytes_sent
+                if failed:
+                    self._stats["errors"] += 1
+                else:
+                    self._stats["completion_tokens"] += completion_tokens
+            if failed:
+                raise FakeLLMError("Injected fake LLM error")
+
+        inc("astra_llm_tokens_total", prompt_tokens, kind="prompt", model=self.model_name)
+        inc("astra_llm_tokens_total", cached_tokens, kind="cached", model=self.model_name)
+        inc("astra_llm_tokens_total", completion_tokens, kind="completion", model=self.model_name)
+        inc("astra_llm_prompt_bytes_total", bytes_sent, model=self.model_name)
+        return text
+
+    @property
+    def _identifying_params(self) -> Mapping[str, Any]:
+        """Return identifying parameters."""
+        return {
+            "model_name": self.model_name,
+            "latency_ms": self.latency_ms,
+            "latency_dist": self.latency_dist,
+            "tokens_per_second": self.tokens_per_second,
+            "prefill_tokens_per_second": self.prefill_tokens_per_second,
+            "error_rate": self.error_rate,
+            "seed": self.seed,
+            "context_cache": self.context_cache,
+        }
+
+
+# ------------------ Canned responses ------------------
+def _fingerprint(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+def _fake_resume_json(prompt: str) -> str:
+    """Build a CandidateData-shaped JSON answer from the resume embedded in the prompt"""
+    match = re.search(r"Resume:\n(.*?)\n\nOutput ONLY", prompt, re.DOTALL)
+    resume_text = match.group(1) if match else prompt
+    fields = autofill_fields_from_text(resume_text)
+    data = {
+        "name": fields["name"].strip(" /|") or "Unknown Candidate",
+        "email": fields["email"].strip(" |") or "candidate@example.com",
+        "phone": fields["phone"].strip() or "0000000000",
+        "location": fields["location"] or None,
+        "years_experience": fields["years_experience"],
+        "tech_stack": fields["tech_stack"],
+        "desired_positions": ["Software Engineer"],
+        "projects": [
+            {
+                "name": f"Project {i + 1}",
+                "description": "A project described in the resume.",
+                "technologies": fields["tech_stack"][i:i + 2],
+            }
+            for i in range(min(2, len(fields["tech_stack"])))
+        ],
+    }
+    # Real models tend to wrap JSON in a markdown fence
+    return "```json\n" + json.dumps(data, indent=2) + "\n```"
+
+def _fake_questions(prompt: str) -> str:
+    tag = _fingerprint(prompt) % 1000
+    return "\n".join(
+        f"{i}. Can you explain how you would approach scenario {tag}-{i} in practice?"
+        for i in (1, 2)
+    )
+
+def fake_response(prompt: str) -> str:
+    """Pick a deterministic response based on what the prompt asks for"""
+    lowered = prompt.lower()
+    if "resume parser" in lowered:
+        return _fake_resume_json(prompt)
+    if "rate the answer" in lowered:
+        return str(_fingerprint(prompt) % 5 + 1)
+    if "questions" in lowered:
+        return _fake_questions(prompt)
+    return f"Fake response ({_fingerprint(prompt):08x})."
@@ -1,19 +1,43 @@
 # gemini_llm.py
 from langchain.llms.base import LLM
-from typing import Optional, List, Mapping, Any
-from pydantic import BaseModel
+from langchain_core.outputs import GenerationChunk
+from typing import Optional, List, Mapping, Any, Dict, Iterator
+from pydantic import BaseModel, PrivateAttr
 import google.generativeai as genai
+import logging
 import os
+import threading
+import time
+from datetime import timedelta
 from dotenv import load_dotenv
+from metrics import inc, span
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful AI assistant specialized in resume parsing."
+
+# Gemini only accepts cached contexts above a minimum size (32k tokens for 1.5
+# models); shorter system prompts are sent as a plain system instruction
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("ASTRA_CONTEXT_CACHE_MIN_TOKENS", "32768"))
+CONTEXT_CACHE_TTL = int(os.getenv("ASTRA_CONTEXT_CACHE_TTL", "3600"))
+
 class GeminiLLM(LLM, BaseModel):
     """
     A LangChain-compatible wrapper for the Gemini 1.5 Flash model.
     """
     model_name: str = "gemini-1.5-flash"
     temperature: float = 0.0
+    # Optional Gemini response_schema; when set the model is constrained to emit matching JSON
+    response_schema: Optional[Dict[str, Any]] = None
+    # Static instructions; sent once as the system instruction / cached context, not per prompt
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT
+    max_output_tokens: Optional[int] = None
+
+    _model: Any = PrivateAttr(default=None)
+    _model_expires: float = PrivateAttr(default=float("inf"))
+    _model_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -24,24 +48,61 @@ class GeminiLLM(LLM, BaseModel):
     def _llm_type(self) -> str:
         return "gemini"
 
-    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
-        """
-        Calls the Gemini model with the prompt and returns text.
-        """
-        model = genai.GenerativeModel(self.model_name)
-        
-        # Set generation config
+    def _generation_config(self) -> Dict[str, Any]:
         generation_config = {
             "temperature": self.temperature,
             "top_p": 1.0,
             "top_k": 32
         }
+        if self.max_output_tokens is not None:
+            generation_config["max_output_tokens"] = self.max_output_tokens
+        if self.response_schema is not None:
+            generation_config["response_mime_type"] = "application/json"
+            generation_config["response_schema"] = self.response_schema
+        return generation_config
+
+    def _build_model(self):
+        """GenerativeModel with the system prompt attached, from cached context when it is big enough"""
+        if len(self.system_prompt) // 4 >= CONTEXT_CACHE_MIN_TOKENS:
+            try:
+                from google.generativeai import caching
+                cached = caching.CachedContent.create(
+                    model=f"models/{self.model_name}",
+                    system_instruction=self.system_prompt,
+                    ttl=timedelta(seconds=CONTEXT_CACHE_TTL),
+                )
+                # Rebuild a little before the provider drops the cache
+                self._model_expires = time.time() + CONTEXT_CACHE_TTL * 0.9
+                return genai.GenerativeModel.from_cached_content(cached_content=cached)
+            except Exception as e:
+                logger.warning("Context caching unavailable for %s, sending system instruction: %s", self.model_name, e)
+        self._model_expires = float("inf")
+        return genai.GenerativeModel(self.model_name, system_instruction=self.system_prompt or None)
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None or time.time() >= self._model_expires:
+                self._model = self._build_model()
+            return self._model
+
+    def _record_usage(self, response) -> None:
+        """Token usage as reported by the API"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            inc("astra_llm_tokens_total", getattr(usage, "prompt_token_count", 0) or 0, kind="prompt", model=self.model_name)
+            inc("astra_llm_tokens_total", getattr(usage, "cached_content_token_count", 0) or 0, kind="cached", model=self.model_name)
+            inc("astra_llm_tokens_total", getattr(usage, "candidates_token_count", 0) or 0, kind="completion", model=self.model_name)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        """
+        Calls the Gemini model with the prompt and returns text.
+        """
+        model = self._get_model()
+        inc("astra_llm_prompt_bytes_total", len(prompt.encode("utf-8")), model=self.model_name)
         
-        # The system prompt needs to be incorporated into the user prompt
-        system_instruction = "You are a helpful AI assistant specialized in resume parsing."
-        full_prompt = f"{system_instruction}\n\n{prompt}"
-        
-        response = model.generate_content(full_prompt, generation_config=generation_config)
+        with span("llm_call", provider="gemini", model=self.model_name):
+            response = model.generate_content(prompt, generation_config=self._generation_config())
+        self._record_usage(response)
         
         # Handle potential errors or empty responses
         if hasattr(response, "text"):
@@ -50,10 +111,27 @@ class GeminiLLM(LLM, BaseModel):
             # If there's an issue with the response
             return "Error: Unable to generate content."
 
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        """
+        Streams the Gemini response chunk by chunk.
+        """
+        model = self._get_model()
+        inc("astra_llm_prompt_bytes_total", len(prompt.encode("utf-8")), model=self.model_name)
+        
+        with span("llm_call", provider="gemini", model=self.model_name):
+            response = model.generate_content(prompt, generation_config=self._generation_config(), stream=True)
+            for chunk in response:
+                text = getattr(chunk, "text", "") or ""
+                if run_manager is not None:
+                    run_manager.on_llm_new_token(text)
+                yield GenerationChunk(text=text)
+        # Usage metadata is complete once the stream has been consumed
+        self._record_usage(response)
+
     @property
     def _identifying_params(self) -> Mapping[str, Any]:
         """Return identifying parameters."""
-        return {"model_name": self.model_name, "temperature": self.temperature}
+        return {"model_name": self.model_name, "temperature": self.temperature, "json_output": self.response_schema is not None}
         
     @property
     def _llm_kwargs(self) -> Mapping[str, Any]:
@@ -1,6 +1,7 @@
 # ---------- Helpers ----------
 from io import BytesIO
 import re
+from metrics import traced
 # Optional libs for parsing (install if needed)
 try:
     import PyPDF2
@@ -24,6 +25,7 @@ EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
 PHONE_RE = re.compile(r"(\+\d{1,3}[\s-]?)?(\(?\d{2,4}\)?[\s-]?)?[\d\s-]{6,15}")
 
 
+@traced()
 def extract_text_from_pdf(bytes_data):
     if PyPDF2 is None:
         return ""
@@ -36,22 +38,30 @@ def extract_text_from_pdf(bytes_data):
             continue
     return "\n".join(text)
 
+@traced()
 def extract_text_from_docx(bytes_data):
     if docx is None:
         return ""
-    tmp_path = "/tmp/_tmp_docx.docx"
-    with open(tmp_path, "wb") as f:
-        f.write(bytes_data)
-    doc = docx.Document(tmp_path)
+    doc = docx.Document(BytesIO(bytes_data))
     paras = [p.text for p in doc.paragraphs if p.text]
     return "\n".join(paras)
 
+@traced()
 def extract_text_from_txt(bytes_data):
     try:
         return bytes_data.decode("utf-8", errors="ignore")
     except:
         return str(bytes_data)
 
+def extract_text_from_upload(filename, bytes_data, content_type=None):
+    """Pick the extractor for an uploaded file based on its name / MIME type"""
+    name = (filename or "").lower()
+    if content_type == "application/pdf" or name.endswith(".pdf"):
+        return extract_text_from_pdf(bytes_data)
+    if name.endswith(".docx"):
+        return extract_text_from_docx(bytes_data)
+    return extract_text_from_txt(bytes_data)
+
 def autofill_fields_from_text(text):
     lines = [l.strip() for l in text.splitlines() if l.strip()]
     name = lines[0] if lines else ""
@@ -1,28 +1,71 @@
+import logging
 import streamlit as st
 import time
 import random
-from datetime import datetime
-from db_utils import save_candidate_response
+from db_utils import get_candidate_responses, record_interview_event, save_candidate_response
+from ledger import attribute
+from session_store import Answer, InterviewState, blob_key, blobs, session_id, touch
 from question_generator import generate_tech_questions, generate_project_questions, generate_job_questions
 import streamlit.components.v1 as components
 
-def save_answer(candidate, question, answer):
+logger = logging.getLogger(__name__)
+
+# Seconds allowed per question (matches the interview instructions shown in app.py)
+QUESTION_TIME_LIMIT = 60
+
+SECTION_HEADERS = {
+    "tech": "💻 Technical Skills Questions",
+    "project": "📋 Project Experience Questions",
+    "job": "🏢 Job Role Questions",
+}
+
+# Client-side countdown. When it reaches zero it blurs the answer box (so Streamlit
+# commits the typed text) and clicks the submit button, so no server polling is needed.
+TIMER_HTML = """
+<div id="timer" style="font-family:sans-serif;">⏱️ %(remaining)ds left</div>
+<script>
+// question %(index)d
+let limit = %(remaining)d;
+const timerEl = document.getElementById("timer");
+const tick = setInterval(function() {
+    limit -= 1;
+    timerEl.innerHTML = "⏱️ " + Math.max(limit, 0) + "s left";
+    if (limit <= 0) {
+        clearInterval(tick);
+        timerEl.innerHTML = "⏱️ Time's up! Submitting...";
+        const doc = window.parent.document;
+        if (doc.activeElement) doc.activeElement.blur();
+        setTimeout(function() {
+            const btn = Array.from(doc.querySelectorAll("button"))
+                .find(b => b.innerText.trim() === "Submit Answer");
+            if (btn) btn.click();
+        }, 300);
+    }
+}, 1000);
+</script>
+"""
+
+def count_run(scope):
+    """Count server executions per session ("script" for full reruns, "interview" for the fragment)"""
+    if "run_counts" not in st.session_state:
+        st.session_state.run_counts = {}
+    counts = st.session_state.run_counts
+    counts[scope] = counts.get(scope, 0) + 1
+    touch(st.session_state)
+
+def save_answer(candidate, question, answer, state=None):
     """Save answer to session state and database"""
-    if "answers" not in st.session_state:
-        st.session_state.answers = []
-    
-    # Add to session state
-    timestamp = datetime.now()
-    st.session_state.answers.append({
-        "candidate": candidate['name'],
-        "question": question,
-        "answer": answer,
-        "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S")
-    })
-    
+    state = st.session_state if state is None else state
+
+    # Keep the answer in the shared blob store; the session only holds its key
+    now = time.time()
+    blobs.append(state.interview.answers_key, Answer(question, answer, now))
+    start_time = state.interview.start_time
+    latency = now - start_time if start_time is not None else None
+
     # Save to database - get candidate_id from session state
     candidate_id = candidate.get("_id")
-    
+
     # If we don't have an ID but have an email, try to look it up
     if not candidate_id and "email" in candidate:
         from db_utils import candidates_col
@@ -30,153 +73,180 @@ def save_answer(candidate, question, answer):
         if existing:
             candidate_id = str(existing["_id"])
             # Store for future use
-            st.session_state.candidate["_id"] = candidate_id
-    
+            state.candidate["_id"] = candidate_id
+
     if candidate_id:
-        save_candidate_response(candidate_id, question, answer)
+        save_candidate_response(candidate_id, question, answer, latency_seconds=latency)
     else:
         st.warning("Could not save response to database - candidate ID not found")
         # Log this for debugging
         print(f"Warning: Response not saved to DB. Candidate data: {candidate.keys()}")
 
-def initialize_interview():
-    """Initialize interview state if not already done"""
-    if "interview_questions" not in st.session_state:
+def initialize_interview(state=None):
+    """Initialize interview state if not already done.
+
+    `state` defaults to st.session_state; any object with attribute access and
+    `in` support (e.g. the load simulator's per-session state) works too.
+    """
+    state = st.session_state if state is None else state
+    if "interview" not in state:
         # Get candidate info
-        candidate = st.session_state.candidate
-        
-        # Generate tech questions (1-2)
-        tech_questions = []
-        if "tech_stack" in candidate and candidate["tech_stack"]:
-            all_tech_q = generate_tech_questions(candidate)
-            tech_questions = random.sample(all_tech_q, min(2, len(all_tech_q)))
-        
-        # Generate project questions (1-2)
-        project_questions = []
-        if "projects" in candidate and candidate["projects"]:
-            all_proj_q = generate_project_questions(candidate)
-            project_questions = random.sample(all_proj_q, min(2, len(all_proj_q)))
-        
-        # Generate job role questions (1-2)
-        job_role = "Software Engineer"
-        job_questions = generate_job_questions(job_role)
-        
-        # Combine all questions
-        st.session_state.interview_questions = tech_questions + project_questions + job_questions
-        st.session_state.current_question_index = 0
-        st.session_state.interview_stage = "tech"
-        st.session_state.current_answer = ""
-        st.session_state.interview_completed = False
-        st.session_state.time_limit = 5.0  # 5 seconds for testing
-        st.session_state.start_time = None
-        print(f"Interview Questions: {st.session_state.interview_questions}")  # Debugging line
+        candidate = state.candidate
+
+        # LLM usage is booked to the candidate (or this session if it has no id yet)
+        with attribute(candidate.get("_id") or session_id(state)):
+            # Generate tech questions (1-2)
+            tech_questions = []
+            if "tech_stack" in candidate and candidate["tech_stack"]:
+                all_tech_q = generate_tech_questions(candidate)
+                tech_questions = random.sample(all_tech_q, min(2, len(all_tech_q)))
 
+            # Generate project questions (1-2)
+            project_questions = []
+            if "projects" in candidate and candidate["projects"]:
+                all_proj_q = generate_project_questions(candidate)
+                project_questions = random.sample(all_proj_q, min(2, len(all_proj_q)))
+
+            # Generate job role questions (1-2)
+            job_role = "Software Engineer"
+            job_questions = generate_job_questions(job_role)
+
+        # Combine all questions, remembering which section each one belongs to
+        answers_key = blobs.put(blob_key(state, "answers"), [])
+        # Other sessions' blobs must not push out answers while the interview runs
+        blobs.pin(answers_key)
+        state.interview = InterviewState(
+            questions=tuple(tech_questions + project_questions + job_questions),
+            sections=("tech",) * len(tech_questions)
+            + ("project",) * len(project_questions)
+            + ("job",) * len(job_questions),
+            time_limit=QUESTION_TIME_LIMIT,
+            answers_key=answers_key,
+        )
+        logger.debug("Interview questions: %s", state.interview.questions)
+        record_interview_event("started")
+
+def record_answer(candidate, index, answer, state=None):
+    """Save the answer to question `index` and advance to the next question.
+
+    Returns False (and does nothing) if `index` is not the current question,
+    e.g. when the timer fires right after a manual submit.
+    """
+    state = st.session_state if state is None else state
+    interview = state.interview
+    if interview.current_index != index:
+        return False
+
+    save_answer(candidate, interview.questions[index], answer, state)
+
+    interview.current_index += 1
+    interview.start_time = None  # Reset timer for next question
+    if interview.current_index >= len(interview.questions):
+        interview.completed = True
+        blobs.unpin(interview.answers_key)
+        # The resume text is no longer needed once the interview is over
+        blobs.delete(blob_key(state, "resume_text"))
+        record_interview_event("completed")
+        logger.info("Interview run counts: %s", state.get("run_counts", {}))
+    return True
+
+def _submit_current_answer(candidate, index):
+    """Button callback for the current question.
+
+    Runs before the fragment re-executes, so the next question renders in the
+    same run without an extra st.rerun().
+    """
+    record_answer(candidate, index, st.session_state.get(f"answer_{index}", ""))
+    # The answer now lives in the blob store; drop the widget's copy
+    st.session_state.pop(f"answer_{index}", None)
+
+@st.fragment
 def start_interview(candidate):
-    """Main interview function"""
+    """Main interview function.
+
+    Rendered as a fragment: submitting an answer only re-executes this
+    function, not the whole app script.
+    """
+    count_run("interview")
+
     # Initialize interview if needed
     initialize_interview()
-    
-    # Display interview progress
-    total_questions = len(st.session_state.interview_questions)
-    current_index = st.session_state.current_question_index
-    
-    # Interview progress indicator
-    progress_text = f"Question {current_index + 1} of {total_questions}"
-    progress_value = (current_index + 1) // total_questions
-    
-    st.progress(progress_value, text=progress_text)
-    
+
+    interview = st.session_state.interview
+
     # Interview completed case
-    if st.session_state.interview_completed:
+    if interview.completed:
         show_interview_summary()
         return
-    
-    # Get current question
-    if current_index < total_questions:
-        current_question = st.session_state.interview_questions[current_index]
-        
-        # Show appropriate section header based on question type
-        if current_index == 0:
-            st.subheader("💻 Technical Skills Questions")
-        elif current_index == len(st.session_state.interview_questions) - len(generate_job_questions("any")):
-            st.subheader("🏢 Job Role Questions")
-        elif st.session_state.interview_stage == "tech" and "projects" in candidate and candidate["projects"]:
-            st.subheader("📋 Project Experience Questions")
-            st.session_state.interview_stage = "project"
-        
-        # Display question
-        st.write(f"**Question {current_index + 1}:** {current_question}")
-        
-        # Initialize timer for this question if needed
-        if st.session_state.start_time is None:
-            st.session_state.start_time = time.time()
-            st.session_state.current_answer = ""
-        
-        # Calculate elapsed time (in backend)
-        elapsed = time.time() - st.session_state.start_time
-        
-        # Timer UI component (shows 30s for better UX, but backend uses time_limit)
-        components.html("""
-            <div id="timer">⏱️ 30s left</div>
-            <script>
-            let limit = 30;
-            let timer = setInterval(function() {
-                document.getElementById("timer").innerHTML = "⏱️ " + limit + "s left";
-                limit -= 1;
-                if (limit < 0) clearInterval(timer);
-            }, 1000);
-            </script>
-        """, height=50)
-
-        # Answer input
-        answer = st.text_area("Your answer:", 
-                             value=st.session_state.current_answer,
-                             height=150,
-                             key=f"answer_{current_index}")
-        
-        # Update current answer in session state
-        st.session_state.current_answer = answer
-        
-        # Allow manual submission
-        if st.button("  Submit Answer", key=f"submit_{current_index}"):
-            # Save answer
-            save_answer(candidate, current_question, answer)
-            
-            # Move to next question
-            st.session_state[f"submitted_{current_index}"] = True
-            st.session_state.current_question_index += 1
-            st.session_state.start_time = None  # Reset timer for next question
-            st.rerun()
-
-        if elapsed >= st.session_state.time_limit:
-            if not st.session_state.get(f"submitted_{current_index}", False):
-                st.warning("Time's up! Moving to next question...")
-                
-                # Save answer
-                save_answer(candidate, current_question, answer)
-                
-                # Move to next question
-                st.session_state[f"submitted_{current_index}"] = True
-                st.session_state.current_question_index += 1
-                st.session_state.start_time = None  # Reset timer for next question
-                st.rerun()
-    else:
-        # All questions answered, mark interview as completed
-        st.session_state.interview_completed = True
+
+    questions = interview.questions
+    total_questions = len(questions)
+    current_index = interview.current_index
+
+    if current_index >= total_questions:
+        # All questions answered (or none could be generated)
+        interview.completed = True
+        blobs.unpin(interview.answers_key)
         show_interview_summary()
+        return
+
+    # Interview progress indicator
+    progress_text = f"Question {current_index + 1} of {total_questions}"
+    st.progress(current_index / total_questions, text=progress_text)
+
+    # Show a section header whenever the question type changes
+    sections = interview.sections
+    section = sections[current_index]
+    if current_index == 0 or sections[current_index - 1] != section:
+        st.subheader(SECTION_HEADERS[section])
+
+    # Display question
+    st.write(f"**Question {current_index + 1}:** {questions[current_index]}")
+
+    # Start the timer for this question on first render
+    if interview.start_time is None:
+        interview.start_time = time.time()
+    elapsed = time.time() - interview.start_time
+    remaining = max(0, int(interview.time_limit - elapsed))
+
+    # Answer input
+    st.text_area("Your answer:", height=150, key=f"answer_{current_index}")
+
+    st.button("Submit Answer",
+              key=f"submit_{current_index}",
+              on_click=_submit_current_answer,
+              args=(candidate, current_index))
+
+    # The countdown runs in the browser and auto-submits when it expires
+    components.html(TIMER_HTML % {"remaining": remaining, "index": current_index}, height=50)
+
+def interview_summary(state=None):
+    """Question/answer pairs recorded so far"""
+    state = st.session_state if state is None else state
+    if "interview" not in state:
+        return []
+    interview = state.interview
+    answers = [{"question": a.question, "answer": a.answer} for a in blobs.get(interview.answers_key, [])]
+    candidate_id = state.get("candidate", {}).get("_id")
+    if len(answers) < interview.current_index and candidate_id:
+        # The answers blob was evicted after the interview (idle session or memory
+        # pressure); rebuild from the saved responses, latest answer per question
+        saved = {r["question"]: r["answer"] for r in get_candidate_responses(candidate_id)}
+        answers = [{"question": q, "answer": saved[q]}
+                   for q in interview.questions[:interview.current_index] if q in saved]
+    if len(answers) < interview.current_index:
+        logger.warning("Interview summary has %d of %d answers", len(answers), interview.current_index)
+    return answers
 
 def show_interview_summary():
     """Display summary of interview responses"""
     st.success("🎉 Interview completed!")
-    
+
     st.subheader("Interview Summary")
     st.write("Thank you for completing the interview. Your responses have been recorded.")
-    
+
     # Show answers summary
-    if "answers" in st.session_state and st.session_state.answers:
-        for i, qa in enumerate(st.session_state.answers):
-            with st.expander(f"Question {i+1}: {qa['question']}"):
-                st.write("**Your answer:**")
-                st.write(qa["answer"])
-                
-        st.rerun()
+    for i, qa in enumerate(interview_summary()):
+        with st.expander(f"Question {i+1}: {qa['question']}"):
+            st.write("**Your answer:**")
+            st.write(qa["answer"])
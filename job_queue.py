@@ -0,0 +1,218 @@
+"""
+Job queue for ASTRA
+A small SQLite-backed queue (no external broker) that takes resume parsing off
+the Streamlit script thread. The UI submits an upload and polls the job by id;
+worker processes run text extraction, parse_resume_to_json and save_candidate.
+
+Run dedicated workers with:
+    python job_queue.py --workers 4
+(or let app.py start ASTRA_JOB_WORKERS local workers itself).
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from ledger import BudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("ASTRA_JOB_DB", "astra_jobs.sqlite3")
+
+# A running job not updated for this long is assumed to belong to a dead worker and is retried
+STALE_AFTER = 600
+MAX_ATTEMPTS = 3
+# Finished jobs are deleted after this many seconds
+JOB_TTL = 24 * 3600
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_local = threading.local()
+
+
+def _connect():
+    """Per-thread connection (SQLite connections can't be shared across threads)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                filename TEXT,
+                content_type TEXT,
+                payload BLOB,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        try:
+            # Queue files created before jobs had owners
+            conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        _local.conn = conn
+    return conn
+
+
+# ------------------ Client API ------------------
+def owner_token(secret):
+    """Owner value stored with a job: a hash, so the queue never holds the secret (e.g. a session id) itself"""
+    return hashlib.sha256(str(secret).encode("utf-8")).hexdigest()
+
+def submit_job(filename, data, content_type=None, owner=None):
+    """Queue an uploaded resume for parsing and return the job id"""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    _connect().execute(
+        "INSERT INTO jobs (id, status, filename, content_type, payload, owner, created_at, updated_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, QUEUED, filename, content_type, sqlite3.Binary(data), owner, now, now),
+    )
+    return job_id
+
+def job_status(job_id, owner=None):
+    """Cheap status lookup: "queued", "running", "done", "failed" or None if unknown (or not owner's)"""
+    row = _connect().execute("SELECT status, owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return row["status"] if row and _owned(row, owner) else None
+
+def _owned(row, owner):
+    # Jobs submitted with an owner are only visible to that owner
+    return row["owner"] is None or hmac.compare_digest(row["owner"], owner or "")
+
+def get_job(job_id, owner=None):
+    """Status, result (decoded) and error for a job, or None if unknown or owned by someone else"""
+    row = _connect().execute(
+        "SELECT id, status, filename, result, error, attempts, owner, created_at, updated_at FROM jobs WHERE id = ?",
+        (job_id,),
+    ).fetchone()
+    if row is None or not _owned(row, owner):
+        return None
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+# ------------------ Worker side ------------------
+def claim_job():
+    """Atomically take the oldest runnable job (or None)"""
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            """SELECT id, filename, content_type, payload, attempts FROM jobs
+               WHERE status = ? OR (status = ? AND updated_at < ?)
+               ORDER BY created_at LIMIT 1""",
+            (QUEUED, RUNNING, now - STALE_AFTER),
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (RUNNING, now, row["id"]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return dict(row) if row is not None else None
+
+def finish_job(job_id, result=None, error=None):
+    """Record a job's outcome; the uploaded bytes are dropped once it is final"""
+    _connect().execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, payload = NULL, updated_at = ? WHERE id = ?",
+        (FAILED if error else DONE, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+    )
+
+def requeue_job(job_id, error):
+    _connect().execute(
+        "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+        (QUEUED, error, time.time(), job_id),
+    )
+
+def purge_jobs(older_than=JOB_TTL):
+    """Delete finished jobs older than `older_than` seconds"""
+    _connect().execute(
+        "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+        (DONE, FAILED, time.time() - older_than),
+    )
+
+def process_job(job):
+    """Extract, parse and store one resume; returns the JSON-serialisable result"""
+    from db_utils import save_candidate
+    from helpers import extract_text_from_upload
+    from ledger import attribute, reassign
+    from resume_parser import PARSER_VERSION, parse_resume_to_json
+    from resume_store import put_resume
+
+    data = bytes(job["payload"])
+    text = extract_text_from_upload(job["filename"], data, job["content_type"])
+    # Keep the original upload and text so future parser versions can re-parse them
+    sha = put_resume(data, text)
+    if not text.strip():
+        return {"text": "", "candidate": None, "candidate_id": None, "message": "No text was extracted."}
+    # Parse tokens are booked to the resume until the candidate id is known
+    with attribute(f"resume:{sha}"):
+        candidate = parse_resume_to_json(text)
+    message, candidate_id = save_candidate(candidate, resume_sha256=sha, parser_version=PARSER_VERSION)
+    reassign(f"resume:{sha}", candidate_id)
+    return {"text": text, "candidate": candidate.model_dump(), "candidate_id": candidate_id, "message": message}
+
+def worker_loop(poll_interval=0.5, stop_event=None):
+    """Claim and run jobs until stop_event is set"""
+    last_purge = 0.0
+    while stop_event is None or not stop_event.is_set():
+        job = claim_job()
+        if job is None:
+            if time.time() - last_purge > 3600:
+                purge_jobs()
+                last_purge = time.time()
+            time.sleep(poll_interval)
+            continue
+        try:
+            finish_job(job["id"], result=process_job(job))
+        except Exception as e:
+            logger.exception("Resume job %s failed (attempt %d)", job["id"], job["attempts"] + 1)
+            if job["attempts"] + 1 >= MAX_ATTEMPTS or isinstance(e, (ValueError, BudgetExceeded)):
+                # ValueError (incl. pydantic ValidationError) won't succeed on retry, and
+                # neither will BudgetExceeded until the budget resets
+                finish_job(job["id"], error=str(e))
+            else:
+                requeue_job(job["id"], str(e))
+
+def start_workers(n):
+    """Start `n` daemon worker processes and return them"""
+    # spawn, not fork: the parent may hold threads and a MongoClient, neither of which is fork-safe
+    ctx = multiprocessing.get_context("spawn")
+    workers = []
+    for _ in range(n):
+        p = ctx.Process(target=worker_loop, daemon=True)
+        p.start()
+        workers.append(p)
+    return workers
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ASTRA resume parsing workers")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    args = ap.parse_args()
+    procs = start_workers(args.workers)
+    print(f"Started {len(procs)} resume parsing worker(s) on {DB_PATH}")
+    for p in procs:
+        p.join()
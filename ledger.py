@@ -0,0 +1,230 @@
+"""
+LLM usage ledger for ASTRA
+Records prompt/completion tokens, wall time and estimated cost of every routed
+LLM call (see llm_loader.RoutedLLM), attributed to the candidate or session
+set with `attribute(...)`. Entries are buffered and written to the llm_ledger
+collection in bulk.
+
+Budgets are checked before each call; a call over budget raises
+BudgetExceeded instead of reaching the provider, and question generation
+falls back to cached or canned questions.
+
+Configuration:
+    ASTRA_CANDIDATE_TOKEN_BUDGET=60000   tokens per candidate / session (0 = unlimited)
+    ASTRA_HOURLY_TOKEN_BUDGET=2000000    tokens per clock hour in this process (0 = unlimited)
+    ASTRA_LLM_PRICES='{"model": [input, output]}'  USD per million tokens, merged into PRICES
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_TOKEN_BUDGET = int(os.getenv("ASTRA_CANDIDATE_TOKEN_BUDGET", "60000"))
+HOURLY_TOKEN_BUDGET = int(os.getenv("ASTRA_HOURLY_TOKEN_BUDGET", "2000000"))
+
+# USD per million (input, output) tokens
+PRICES = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "meta-llama/llama-3-3-70b-instruct": (0.71, 0.71),
+}
+PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("ASTRA_LLM_PRICES", "{}")).items()})
+
+# Buffered entries are written when this many accumulate or the oldest is this old
+FLUSH_EVERY = 100
+FLUSH_SECONDS = 5.0
+# Entries kept for retry while the collection can't be written; the oldest are dropped beyond this
+MAX_BUFFER = 10000
+# Subjects whose usage is kept in memory; least recently used ones are re-seeded when seen again
+MAX_SUBJECTS = 10000
+
+_subject = ContextVar("astra_ledger_subject", default=None)
+_lock = threading.Lock()
+_buffer = []
+_buffer_since = 0.0
+_subject_tokens = OrderedDict()  # subject -> tokens used (seeded from the collection on first use)
+_hour_tokens = {}     # clock hour -> tokens used in this process
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised instead of calling the provider when a token budget is used up"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+def cost_usd(model, prompt_tokens, completion_tokens):
+    price_in, price_out = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+# ------------------ Attribution ------------------
+@contextmanager
+def attribute(subject):
+    """Attribute LLM calls made inside the block (and in threadpools it spawns via run_in_threadpool) to `subject`"""
+    token = _subject.set(str(subject) if subject else None)
+    try:
+        yield
+    finally:
+        _subject.reset(token)
+
+def current_subject():
+    return _subject.get()
+
+
+# ------------------ Budgets ------------------
+def _add_subject_tokens(subject, tokens):
+    # Caller holds _lock
+    _subject_tokens[subject] = _subject_tokens.get(subject, 0) + tokens
+    _subject_tokens.move_to_end(subject)
+    while len(_subject_tokens) > MAX_SUBJECTS:
+        _subject_tokens.popitem(last=False)
+
+def _seed(subject):
+    """Load a subject's earlier usage (e.g. from another process or a restart) the first time it is seen"""
+    if not subject or subject in _subject_tokens:
+        return
+    from db_utils import llm_ledger_col
+    rows = list(llm_ledger_col.aggregate([
+        {"$match": {"subject": subject}},
+        {"$group": {"_id": None, "tokens": {"$sum": {"$add": ["$prompt_tokens", "$completion_tokens"]}}}},
+    ]))
+    with _lock:
+        if subject not in _subject_tokens:
+            # Entries still buffered here aren't in the collection yet
+            buffered = sum(e["prompt_tokens"] + e["completion_tokens"] for e in _buffer if e["subject"] == subject)
+            _add_subject_tokens(subject, (rows[0]["tokens"] if rows else 0) + buffered)
+
+def check_budget(task):
+    """Raise BudgetExceeded if the current subject or this hour is over budget"""
+    subject = current_subject()
+    _seed(subject)
+    hour = int(time.time() // 3600)
+    with _lock:
+        if HOURLY_TOKEN_BUDGET and _hour_tokens.get(hour, 0) >= HOURLY_TOKEN_BUDGET:
+            reason = "hourly"
+        elif subject and CANDIDATE_TOKEN_BUDGET and _subject_tokens.get(subject, 0) >= CANDIDATE_TOKEN_BUDGET:
+            reason = "candidate"
+        else:
+            return
+    inc("astra_llm_budget_rejections_total", task=task, budget=reason)
+    raise BudgetExceeded(f"{reason} token budget exceeded for {task} (subject {subject})")
+
+
+# ------------------ Recording ------------------
+def record(task, model, prompt, completion, seconds, error=None):
+    """
+    Add one call to the ledger and the budget counters. `prompt` should be
+    everything the provider bills as input, including any system prompt.
+    """
+    subject = current_subject()
+    prompt_tokens = estimate_tokens(prompt)
+    completion_tokens = estimate_tokens(completion)
+    tokens = prompt_tokens + completion_tokens
+    entry = {
+        "subject": subject,
+        "task": task,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "seconds": round(seconds, 4),
+        "cost_usd": cost_usd(model, prompt_tokens, completion_tokens),
+        "error": error,
+        "timestamp": datetime.now(),
+    }
+    global _buffer_since
+    _seed(subject)
+    with _lock:
+        hour = int(time.time() // 3600)
+        _hour_tokens[hour] = _hour_tokens.get(hour, 0) + tokens
+        for old in [h for h in _hour_tokens if h < hour]:
+            del _hour_tokens[old]
+        if subject:
+            _add_subject_tokens(subject, tokens)
+        if not _buffer:
+            _buffer_since = time.time()
+        _buffer.append(entry)
+        due = len(_buffer) >= FLUSH_EVERY or time.time() - _buffer_since >= FLUSH_SECONDS
+    inc("astra_llm_cost_usd_total", entry["cost_usd"], task=task, model=model)
+    if due:
+        flush()
+
+def flush():
+    """Write buffered entries with one insert_many; on failure they are kept for the next flush"""
+    global _buffer, _buffer_since
+    with _lock:
+        entries, _buffer = _buffer, []
+    if not entries:
+        return
+    from db_utils import llm_ledger_col
+    try:
+        llm_ledger_col.insert_many(entries, ordered=False)
+    except Exception as e:
+        # insert_many gave each entry an _id, so entries written before the error
+        # come back as duplicate-key errors (11000) on retry and are not kept
+        errors = getattr(e, "details", None) or {}
+        if "writeErrors" in errors:
+            entries = [entries[err["index"]] for err in errors["writeErrors"] if err.get("code") != 11000]
+        if not entries:
+            return
+        logger.exception("Could not write %d ledger entries; keeping them for the next flush", len(entries))
+        inc("astra_llm_ledger_write_errors_total")
+        with _lock:
+            _buffer = (entries + _buffer)[-MAX_BUFFER:]
+            _buffer_since = time.time()
+
+atexit.register(flush)
+
+
+def reassign(old_subject, new_subject):
+    """Move usage recorded before a subject was known (e.g. "resume:<sha>" while parsing) to its candidate id"""
+    if not old_subject or not new_subject or old_subject == new_subject:
+        return
+    from db_utils import llm_ledger_col
+
+    flush()
+    llm_ledger_col.update_many({"subject": old_subject}, {"$set": {"subject": str(new_subject)}})
+    with _lock:
+        moved = _subject_tokens.pop(old_subject, 0)
+        if str(new_subject) in _subject_tokens:
+            _add_subject_tokens(str(new_subject), moved)
+        # otherwise the next _seed() reads the moved entries from the collection
+
+
+# ------------------ Queries ------------------
+def usage(subject):
+    """Token, time and cost totals per task for a candidate / session"""
+    from db_utils import llm_ledger_col
+
+    flush()
+    rows = llm_ledger_col.aggregate([
+        {"$match": {"subject": str(subject)}},
+        {"$group": {
+            "_id": "$task",
+            "calls": {"$sum": 1},
+            "prompt_tokens": {"$sum": "$prompt_tokens"},
+            "completion_tokens": {"$sum": "$completion_tokens"},
+            "seconds": {"$sum": "$seconds"},
+            "cost_usd": {"$sum": "$cost_usd"},
+        }},
+    ])
+    tasks = {row.pop("_id"): row for row in rows}
+    return {
+        "subject": str(subject),
+        "tokens": sum(t["prompt_tokens"] + t["completion_tokens"] for t in tasks.values()),
+        "cost_usd": round(sum(t["cost_usd"] for t in tasks.values()), 6),
+        "budget_tokens": CANDIDATE_TOKEN_BUDGET or None,
+        "tasks": tasks,
+    }
@@ -3,23 +3,52 @@ LLM Loader module for ASTRA
 This module centralizes loading of different language models for use across the application.
 """
 
+import hashlib
+import json
+import logging
 import os
-from typing import Optional, Dict, Any
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Optional, Dict, Any, Iterator, List, Mapping, Tuple
 from dotenv import load_dotenv
 import google.generativeai as genai
+from langchain.llms.base import LLM
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.outputs import GenerationChunk
 from langchain_ibm import ChatWatsonx
 from ibm_watsonx_ai.foundation_models.schema import TextChatParameters
+from pydantic import PrivateAttr
 from gemini_llm import GeminiLLM
+from fake_llm import FakeLLM
+import ledger
+from metrics import gauge, inc, observe
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Dictionary to store initialized LLMs to avoid recreating them
 _llm_cache = {}
 
+def _digest(value: Any) -> str:
+    """Short stable hash of a schema or prompt, for cache keys"""
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()[:12]
+
+def _record_cache_lookup(cache_key: str, force_reload: bool) -> None:
+    """Count LLM instance cache hits / misses"""
+    hit = cache_key in _llm_cache and not force_reload
+    inc("astra_cache_requests_total", cache="llm_instance", result="hit" if hit else "miss")
+
 def get_gemini_llm(
     model_name: str = "gemini-1.5-flash", 
     temperature: float = 0.0,
+    response_schema: Optional[Dict[str, Any]] = None,
+    system_prompt: Optional[str] = None,
+    max_output_tokens: Optional[int] = None,
     force_reload: bool = False
 ) -> GeminiLLM:
     """
@@ -28,13 +57,22 @@ def get_gemini_llm(
     Args:
         model_name: The model to use (default: gemini-1.5-flash)
         temperature: Controls randomness (0.0 to 1.0)
+        response_schema: Optional Gemini response schema to constrain output to JSON
+        system_prompt: Static instructions sent as the system instruction (and
+            registered as cached context when long enough) instead of with every prompt
+        max_output_tokens: Optional cap on completion tokens
         force_reload: If True, creates a new instance even if cached
         
     Returns:
         An initialized GeminiLLM instance
     """
-    cache_key = f"gemini_{model_name}_{temperature}"
+    cache_key = f"gemini_{model_name}_{temperature}_{max_output_tokens}"
+    if response_schema is not None:
+        cache_key += "_" + _digest(response_schema)
+    if system_prompt is not None:
+        cache_key += "_sys" + _digest(system_prompt)
     
+    _record_cache_lookup(cache_key, force_reload)
     if cache_key not in _llm_cache or force_reload:
         # Ensure API key is available
         api_key = os.getenv("GEMINI_API_KEY")
@@ -42,17 +80,57 @@ def get_gemini_llm(
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         
         # Initialize and cache the LLM
+        kwargs = {"system_prompt": system_prompt} if system_prompt is not None else {}
         _llm_cache[cache_key] = GeminiLLM(
             model_name=model_name,
-            temperature=temperature
+            temperature=temperature,
+            response_schema=response_schema,
+            max_output_tokens=max_output_tokens,
+            **kwargs
+        )
+    
+    return _llm_cache[cache_key]
+
+def get_gemini_chat_model(
+    model_name: str = "gemini-1.5-flash",
+    temperature: float = 0.2,
+    max_output_tokens: Optional[int] = None,
+    force_reload: bool = False
+) -> ChatGoogleGenerativeAI:
+    """
+    Get a Gemini chat model, which keeps the roles of system / history messages.
+    
+    Args:
+        model_name: The model to use (default: gemini-1.5-flash)
+        temperature: Controls randomness (0.0 to 1.0)
+        max_output_tokens: Optional cap on completion tokens
+        force_reload: If True, creates a new instance even if cached
+        
+    Returns:
+        An initialized ChatGoogleGenerativeAI instance
+    """
+    cache_key = f"gemini_chat_{model_name}_{temperature}_{max_output_tokens}"
+    
+    _record_cache_lookup(cache_key, force_reload)
+    if cache_key not in _llm_cache or force_reload:
+        # GOOGLE_API_KEY is what the chat assistant originally read; GEMINI_API_KEY works too
+        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY or GEMINI_API_KEY not found in environment variables")
+        
+        _llm_cache[cache_key] = ChatGoogleGenerativeAI(
+            model=model_name,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            api_key=api_key,
         )
     
     return _llm_cache[cache_key]
 
 def get_watsonx_llm(
-    model_id: str = "ibm/granite-13b-instruct-v2",
+    model_id: str = "meta-llama/llama-3-3-70b-instruct",
     temperature: float = 0.0,
-    max_new_tokens: int = 1000,
+    max_new_tokens: int = 500,
     force_reload: bool = False
 ) -> ChatWatsonx:
     """
@@ -69,6 +147,7 @@ def get_watsonx_llm(
     """
     cache_key = f"watsonx_{model_id}_{temperature}_{max_new_tokens}"
     
+    _record_cache_lookup(cache_key, force_reload)
     if cache_key not in _llm_cache or force_reload:
         # Ensure API key and project ID are available
         watsonx_apikey = os.getenv("WATSONX_APIKEY")
@@ -76,12 +155,11 @@ def get_watsonx_llm(
         watsonx_url = os.getenv("WATSONX_URL")
         
         # Parameters for WatsonX
-        parameters = TextChatParameters(max_tokens=500, temperature=0.0, top_p=1)
+        parameters = TextChatParameters(max_tokens=max_new_tokens, temperature=temperature, top_p=1)
         
         # Initialize and cache the LLM
         _llm_cache[cache_key] = ChatWatsonx(
-            model_id="meta-llama/llama-3-3-70b-instruct",
-            # model_id=model_id,
+            model_id=model_id,
             url=watsonx_url,
             apikey=watsonx_apikey,
             project_id=watsonx_project_id,
@@ -90,6 +168,63 @@ def get_watsonx_llm(
     
     return _llm_cache[cache_key]
 
+def get_fake_llm(
+    latency_ms: Optional[float] = None,
+    latency_dist: Optional[str] = None,
+    tokens_per_second: Optional[float] = None,
+    error_rate: Optional[float] = None,
+    seed: Optional[int] = None,
+    model_name: Optional[str] = None,
+    system_prompt: Optional[str] = None,
+    context_cache: Optional[bool] = None,
+    prefill_tokens_per_second: Optional[float] = None,
+    force_reload: bool = False,
+    **_provider_kwargs
+) -> FakeLLM:
+    """
+    Get the deterministic offline LLM used for benchmarks and load tests.
+    
+    Unset arguments fall back to the ASTRA_FAKE_* environment variables. Extra
+    keyword arguments meant for real providers (model_name, model_id, ...) are
+    accepted and ignored so callers don't need to change.
+    
+    Args:
+        latency_ms: Median time to first token in milliseconds
+        latency_dist: "fixed", "uniform" or "lognormal"
+        tokens_per_second: Completion speed (0 = instant)
+        error_rate: Probability (0.0 to 1.0) that a call raises FakeLLMError
+        seed: Seed for latency / error sampling
+        model_name: Label for metrics (e.g. the real model a routed task would use)
+        system_prompt: Static prefix, treated like a real provider's system instruction
+        context_cache: Send system_prompt only on the first call (simulated context caching)
+        prefill_tokens_per_second: Time to first token per prompt token sent (0 = free)
+        force_reload: If True, creates a new instance even if cached
+        
+    Returns:
+        An initialized FakeLLM instance
+    """
+    params = {
+        "model_name": model_name or "fake",
+        "latency_ms": latency_ms if latency_ms is not None else float(os.getenv("ASTRA_FAKE_LATENCY_MS", "0")),
+        "latency_dist": latency_dist or os.getenv("ASTRA_FAKE_LATENCY_DIST", "fixed"),
+        "tokens_per_second": tokens_per_second if tokens_per_second is not None else float(os.getenv("ASTRA_FAKE_TOKENS_PER_SEC", "0")),
+        "error_rate": error_rate if error_rate is not None else float(os.getenv("ASTRA_FAKE_ERROR_RATE", "0")),
+        "seed": seed if seed is not None else int(os.getenv("ASTRA_FAKE_SEED", "0")),
+        "context_cache": context_cache if context_cache is not None
+        else os.getenv("ASTRA_FAKE_CONTEXT_CACHE", "1").lower() in ("1", "true", "yes"),
+        "prefill_tokens_per_second": prefill_tokens_per_second if prefill_tokens_per_second is not None
+        else float(os.getenv("ASTRA_FAKE_PREFILL_TOKENS_PER_SEC", "0")),
+    }
+    cache_key = "fake_" + "_".join(str(v) for v in params.values())
+    if system_prompt is not None:
+        cache_key += "_sys" + _digest(system_prompt)
+    
+    _record_cache_lookup(cache_key, force_reload)
+    if cache_key not in _llm_cache or force_reload:
+        _llm_cache[cache_key] = FakeLLM(system_prompt=system_prompt, **params)
+    
+    return _llm_cache[cache_key]
+
 def get_llm(
     provider: str = "watsonx",
     **kwargs
@@ -97,18 +232,278 @@ def get_llm(
     """
     Unified function to get an LLM of any supported type.
     
+    Setting ASTRA_LLM_PROVIDER overrides the requested provider everywhere,
+    e.g. ASTRA_LLM_PROVIDER=fake runs the whole app offline.
+    
     Args:
-        provider: The LLM provider to use ("gemini", "watsonx")
+        provider: The LLM provider to use ("gemini", "watsonx", "fake")
         **kwargs: Parameters specific to the chosen provider
         
     Returns:
         An initialized LLM instance
     """
-    provider = provider.lower()
+    provider = os.getenv("ASTRA_LLM_PROVIDER", provider).lower()
     
-    if provider == "gemini":
+    if provider == "fake":
+        return get_fake_llm(**kwargs)
+    elif provider == "gemini":
         return get_gemini_llm(**kwargs)
     elif provider == "watsonx":
         return get_watsonx_llm(**kwargs)
     else:
-        raise ValueError(f"Unsupported LLM provider: {provider}")
\ No newline at end of file
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+# ------------------ Task routing ------------------
+@dataclass(frozen=True)
+class Route:
+    """Model choice for one task; `fallbacks` are tried in order while the route misses its SLO"""
+    provider: str
+    model: str
+    max_tokens: int
+    slo_ms: float
+    fallbacks: Tuple[str, ...] = ()
+    temperature: float = 0.0
+
+ROUTES = {
+    "parse": Route("gemini", "gemini-1.5-flash", 2048, 10000, ("gemini-1.5-flash-8b",)),
+    # resume_parser.get_parser_llm("watsonx")
+    "parse_watsonx": Route("watsonx", "meta-llama/llama-3-3-70b-instruct", 2048, 15000),
+    "tech_questions": Route("gemini", "gemini-1.5-flash", 256, 4000, ("gemini-1.5-flash-8b",)),
+    "project_questions": Route("gemini", "gemini-1.5-flash", 256, 4000, ("gemini-1.5-flash-8b",)),
+    "job_questions": Route("gemini", "gemini-1.5-flash", 256, 4000, ("gemini-1.5-flash-8b",)),
+    "chat": Route("gemini", "gemini-1.5-flash", 512, 3000, ("gemini-1.5-flash-8b",), temperature=0.2),
+    "evaluation": Route("gemini", "gemini-1.5-flash", 8, 2000, ("gemini-1.5-flash-8b",)),
+}
+
+PROVIDERS = ("gemini", "watsonx", "fake")
+
+# ASTRA_ROUTES='{"chat": {"model": "gemini-1.5-flash-8b", "slo_ms": 1500}}' overrides fields per task
+for _task, _fields in json.loads(os.getenv("ASTRA_ROUTES", "{}")).items():
+    if "fallbacks" in _fields:
+        _fields["fallbacks"] = tuple(_fields["fallbacks"])
+    ROUTES[_task] = replace(ROUTES[_task], **_fields) if _task in ROUTES else Route(**_fields)
+    if ROUTES[_task].provider not in PROVIDERS:
+        raise ValueError(f"ASTRA_ROUTES: unsupported provider {ROUTES[_task].provider!r} for {_task}")
+
+class ModelRouter:
+    """
+    Tracks observed latency per (task, model) and picks each task's model.
+
+    When the p95 of the last `window` calls of the current model exceeds the
+    route's SLO the task moves to its next fallback; after `cooldown` seconds
+    it steps back up to retry the preferred model.
+    """
+
+    def __init__(self, routes, window=50, min_samples=10, cooldown=300.0):
+        self.routes = routes
+        self.window = window
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self._samples = {}  # (task, model) -> deque of seconds
+        self._levels = {}   # task -> (index into the model chain, time of last change)
+        self._lock = threading.Lock()
+
+    def models(self, task: str) -> Tuple[str, ...]:
+        route = self.routes[task]
+        return (route.model,) + route.fallbacks
+
+    def current_model(self, task: str) -> str:
+        """The task's model right now, without stepping back up after the cooldown"""
+        models = self.models(task)
+        with self._lock:
+            level, _ = self._levels.get(task, (0, 0.0))
+        return models[min(level, len(models) - 1)]
+
+    def model_for(self, task: str) -> str:
+        models = self.models(task)
+        with self._lock:
+            level, changed = self._levels.get(task, (0, 0.0))
+            if level and time.time() - changed >= self.cooldown:
+                level -= 1
+                self._levels[task] = (level, time.time())
+                self._samples.pop((task, models[level]), None)
+                logger.info("Route %s: retrying %s", task, models[level])
+        return models[min(level, len(models) - 1)]
+
+    def record(self, task: str, model: str, seconds: float) -> None:
+        route = self.routes[task]
+        models = self.models(task)
+        observe("astra_route_latency_seconds", seconds, task=task, model=model)
+        with self._lock:
+            samples = self._samples.setdefault((task, model), deque(maxlen=self.window))
+            samples.append(seconds)
+            level, _ = self._levels.get(task, (0, 0.0))
+            if model != models[level] or level + 1 >= len(models) or len(samples) < self.min_samples:
+                return
+            p95 = sorted(samples)[int(0.95 * (len(samples) - 1))]
+            if p95 * 1000 <= route.slo_ms:
+                return
+            self._levels[task] = (level + 1, time.time())
+        logger.warning("Route %s: p95 %.0f ms over %.0f ms SLO on %s, downgrading to %s",
+                       task, p95 * 1000, route.slo_ms, model, models[level + 1])
+        inc("astra_route_downgrades_total", task=task, model=model)
+        gauge("astra_route_level", level + 1, task=task)
+
+    def status(self) -> Dict[str, Any]:
+        """Current model and recent p95 per task"""
+        report = {}
+        for task in self.routes:
+            # Read-only: reporting must not trigger the cooldown step-up that model_for does
+            model = self.current_model(task)
+            with self._lock:
+                samples = sorted(self._samples.get((task, model), ()))
+            report[task] = {
+                "model": model,
+                "slo_ms": self.routes[task].slo_ms,
+                "p95_ms": round(samples[int(0.95 * (len(samples) - 1))] * 1000, 1) if samples else None,
+                "samples": len(samples),
+            }
+        return report
+
+router = ModelRouter(ROUTES)
+
+def _provider(route: Route) -> str:
+    """The provider a route's calls go to (ASTRA_LLM_PROVIDER overrides every route)"""
+    return os.getenv("ASTRA_LLM_PROVIDER", route.provider).lower()
+
+def _route_kwargs(route: Route, model: str, llm_kwargs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Provider-specific constructor arguments for one model of a route.
+    watsonx takes neither response_schema nor system_prompt: the schema is
+    dropped (the output parser still validates) and RoutedLLM sends the
+    system prompt as a system message instead.
+    """
+    if _provider(route) == "watsonx":
+        return {"model_id": model, "temperature": route.temperature, "max_new_tokens": route.max_tokens}
+    return {"model_name": model, "temperature": route.temperature, "max_output_tokens": route.max_tokens,
+            **(llm_kwargs or {})}
+
+def _record_call(task: str, model: str, prompt: str, completion: str, seconds: float, error: Optional[str]) -> None:
+    """Feed one routed call to the router's latency window and the token ledger"""
+    router.record(task, model, seconds)
+    try:
+        ledger.record(task, model, prompt, completion, seconds, error)
+    except Exception:
+        # Bookkeeping must not replace the model's answer with an error
+        logger.exception("Could not record %s call in the ledger", task)
+
+class RoutedLLM(LLM):
+    """
+    A LangChain LLM that resolves the model for `task` on every call, so
+    downgrades take effect in chains built at import time. Every call is
+    checked against and recorded in the token ledger (ledger.py).
+    """
+    task: str
+    # Extra arguments for every model of the route (response_schema, system_prompt, ...)
+    llm_kwargs: Dict[str, Any] = {}
+
+    _instances: dict = PrivateAttr(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    def _llm(self, model: str):
+        llm = self._instances.get(model)
+        if llm is None:
+            route = router.routes[self.task]
+            llm = self._instances[model] = get_llm(_provider(route), **_route_kwargs(route, model, self.llm_kwargs))
+        return llm
+
+    def _input(self, prompt: str) -> Any:
+        """What to send the provider: chat messages where the system prompt can't be passed at construction"""
+        system_prompt = self.llm_kwargs.get("system_prompt")
+        if system_prompt and _provider(router.routes[self.task]) == "watsonx":
+            return [SystemMessage(content=system_prompt), HumanMessage(content=prompt)]
+        return prompt
+
+    def _record(self, model: str, prompt: str, completion: str, seconds: float, error: Optional[str]) -> None:
+        # The provider bills the system prompt on every call, even though it is not part of `prompt`
+        system_prompt = self.llm_kwargs.get("system_prompt")
+        billed = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+        _record_call(self.task, model, billed, completion, seconds, error)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        ledger.check_budget(self.task)
+        model = router.model_for(self.task)
+        start = time.perf_counter()
+        text, error = "", None
+        try:
+            response = self._llm(model).invoke(self._input(prompt), stop=stop)
+            text = response.content if hasattr(response, "content") else str(response)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._record(model, prompt, text, time.perf_counter() - start, error)
+        return text
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        ledger.check_budget(self.task)
+        model = router.model_for(self.task)
+        start = time.perf_counter()
+        parts, error = [], None
+        try:
+            for chunk in self._llm(model).stream(self._input(prompt), stop=stop):
+                text = chunk.content if hasattr(chunk, "content") else str(chunk)
+                parts.append(text)
+                if run_manager is not None:
+                    run_manager.on_llm_new_token(text)
+                yield GenerationChunk(text=text)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._record(model, prompt, "".join(parts), time.perf_counter() - start, error)
+
+    @property
+    def _identifying_params(self) -> Mapping[str, Any]:
+        """Return identifying parameters."""
+        return {"task": self.task}
+
+def get_task_llm(task: str, **llm_kwargs) -> RoutedLLM:
+    """
+    Get the LLM for a task ("parse", "parse_watsonx", "tech_questions",
+    "project_questions", "job_questions", "chat", "evaluation") as configured in ROUTES.
+    
+    Args:
+        task: Key of ROUTES
+        **llm_kwargs: Extra provider arguments (e.g. response_schema, system_prompt)
+        
+    Returns:
+        A RoutedLLM that picks the task's current model on each call
+    """
+    if task not in ROUTES:
+        raise ValueError(f"Unknown LLM task: {task}")
+    cache_key = f"routed_{task}_{_digest(llm_kwargs)}"
+    if cache_key not in _llm_cache:
+        _llm_cache[cache_key] = RoutedLLM(task=task, llm_kwargs=llm_kwargs)
+    return _llm_cache[cache_key]
+
+def invoke_task_chat(task: str, messages: List[BaseMessage]) -> str:
+    """
+    Send chat messages (system, history, user) to the task's current model and
+    return the reply text. Gemini and watsonx get the messages with their roles;
+    the fake provider, a text model, gets them flattened into one prompt. Calls
+    are budgeted, routed and recorded like RoutedLLM calls.
+    """
+    route = router.routes[task]
+    provider = _provider(route)
+    ledger.check_budget(task)
+    model = router.model_for(task)
+    if provider == "gemini":
+        llm = get_gemini_chat_model(model, route.temperature, route.max_tokens)
+    else:
+        llm = get_llm(provider, **_route_kwargs(route, model))
+    start = time.perf_counter()
+    text, error = "", None
+    try:
+        response = llm.invoke(messages)
+        text = response.content if hasattr(response, "content") else str(response)
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        prompt = "\n\n".join(str(m.content) for m in messages)
+        _record_call(task, model, prompt, text, time.perf_counter() - start, error)
+    return text
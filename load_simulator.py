@@ -0,0 +1,201 @@
+"""
+Concurrent-interview load simulator for ASTRA
+Drives N virtual candidates through the interview flow in interview.py
+(initialize_interview -> record_answer per question -> interview_summary)
+against the fake LLM provider and the in-memory Mongo stand-in, at one or
+more concurrency levels, to find where throughput stops scaling on a host.
+
+Usage:
+    python load_simulator.py --candidates 200 --concurrency 1 4 16 64 \\
+        --think-time 0.05 --answer-chars 400 --llm-latency-ms 300
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SimulatedSessionState(dict):
+    """Stand-in for st.session_state: a dict with attribute access"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def deep_sizeof(obj, _seen=None):
+    """Approximate retained size in bytes of obj and everything it references"""
+    _seen = set() if _seen is None else _seen
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if hasattr(type(obj), "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, s), _seen) for s in type(obj).__slots__ if hasattr(obj, s))
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, _seen) + deep_sizeof(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(i, _seen) for i in obj)
+    return size
+
+
+def make_candidates(n, seed):
+    """Create and store n synthetic candidates, returning their dicts (with _id)"""
+    from db_utils import save_candidate
+    from helpers import TECH_KEYWORDS
+    from resume_parser import CandidateData
+
+    rng = random.Random(seed)
+    candidates = []
+    for i in range(n):
+        tech = rng.sample(TECH_KEYWORDS, rng.randint(2, 6))
+        data = CandidateData(
+            name=f"Virtual Candidate {i}",
+            email=f"candidate{i}@loadtest.example.com",
+            phone="0000000000",
+            location="Remote",
+            years_experience=rng.randint(0, 15),
+            tech_stack=tech,
+            desired_positions=["Software Engineer"],
+            projects=[{"name": f"Project {i}-{j}", "description": "Load test project", "technologies": tech[:2]}
+                      for j in range(rng.randint(0, 2))],
+        ).model_dump()
+        _, data["_id"] = save_candidate(CandidateData(**data))
+        candidates.append(data)
+    return candidates
+
+
+def run_session(candidate, think_time, answer_chars, rng):
+    """One virtual candidate's interview; returns the finished session state"""
+    from interview import initialize_interview, interview_summary, record_answer
+
+    state = SimulatedSessionState(candidate=candidate)
+    initialize_interview(state)
+    interview = state.interview
+    while not interview.completed and interview.current_index < len(interview.questions):
+        if think_time:
+            time.sleep(rng.expovariate(1.0 / think_time))
+        answer = ("lorem ipsum " * (answer_chars // 12 + 1))[:answer_chars]
+        record_answer(candidate, interview.current_index, answer, state)
+    interview_summary(state)
+    return state
+
+
+def run_level(candidates, concurrency, think_time, answer_chars, arrival_rate, seed):
+    """Run every candidate through an interview with `concurrency` workers"""
+    from benchmark import percentile
+    from db_utils import responses_col
+    from session_store import blobs, current_rss_bytes
+
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    queue_delays, session_times, sizes, errors = [], [], [], [0]
+
+    def worker(candidate, scheduled_at, session_seed):
+        started = time.perf_counter()
+        try:
+            state = run_session(candidate, think_time, answer_chars, random.Random(session_seed))
+        except Exception:
+            with lock:
+                errors[0] += 1
+            return
+        finished = time.perf_counter()
+        # Session state plus the blobs it references in the shared store
+        size = deep_sizeof(state) + deep_sizeof(blobs.get(state.interview.answers_key, []))
+        with lock:
+            queue_delays.append(started - scheduled_at)
+            session_times.append(finished - started)
+            sizes.append(size)
+
+    writes_before = responses_col.count_documents({})
+    level_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for candidate in candidates:
+            if arrival_rate > 0:
+                time.sleep(rng.expovariate(arrival_rate))
+            pool.submit(worker, candidate, time.perf_counter(), rng.random())
+    wall = time.perf_counter() - level_start
+    writes = responses_col.count_documents({}) - writes_before
+
+    queue_delays.sort()
+    session_times.sort()
+    completed = len(session_times)
+    return {
+        "concurrency": concurrency,
+        "sessions": completed,
+        "errors": errors[0],
+        "wall_s": round(wall, 3),
+        "sessions_per_s": round(completed / wall, 2) if wall else 0.0,
+        "queue_delay_p50_ms": round(percentile(queue_delays, 50) * 1000, 2),
+        "queue_delay_p95_ms": round(percentile(queue_delays, 95) * 1000, 2),
+        "session_p50_ms": round(percentile(session_times, 50) * 1000, 2),
+        "session_p95_ms": round(percentile(session_times, 95) * 1000, 2),
+        "memory_per_session_kb": round(sum(sizes) / len(sizes) / 1024, 2) if sizes else 0.0,
+        "process_rss_mb": round(current_rss_bytes() / 1024 / 1024, 1),
+        "db_writes_per_s": round(writes / wall, 2) if wall else 0.0,
+    }
+
+
+def find_knee(levels, min_gain=0.1):
+    """First concurrency level after which throughput improves by less than min_gain"""
+    for prev, cur in zip(levels, levels[1:]):
+        if prev["sessions_per_s"] and cur["sessions_per_s"] < prev["sessions_per_s"] * (1 + min_gain):
+            return prev["concurrency"]
+    return levels[-1]["concurrency"] if levels else None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ASTRA concurrent-interview load simulator")
+    ap.add_argument("--candidates", type=int, default=100, help="Virtual candidates per concurrency level")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--think-time", type=float, default=0.0, help="Mean seconds a candidate spends per answer")
+    ap.add_argument("--answer-chars", type=int, default=400, help="Characters per answer")
+    ap.add_argument("--arrival-rate", type=float, default=0.0,
+                    help="New sessions per second (Poisson); 0 starts them all at once")
+    ap.add_argument("--llm-latency-ms", type=float, help="Fake LLM median latency (sets ASTRA_FAKE_LATENCY_MS)")
+    ap.add_argument("--question-cache", action="store_true",
+                    help="Serve repeated question prompts from the response cache (off: every session calls the LLM)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--output", help="Write the per-level report to this JSON file")
+    args = ap.parse_args(argv)
+
+    # Must be set before any ASTRA module is imported
+    os.environ.setdefault("ASTRA_LLM_PROVIDER", "fake")
+    os.environ.setdefault("ASTRA_DB_BACKEND", "memory")
+    # Virtual candidates share skills, so with the cache every level after the first would time cache hits
+    os.environ["ASTRA_RESPONSE_CACHE"] = "1" if args.question_cache else "0"
+    if args.llm_latency_ms is not None:
+        os.environ["ASTRA_FAKE_LATENCY_MS"] = str(args.llm_latency_ms)
+        os.environ.setdefault("ASTRA_FAKE_LATENCY_DIST", "lognormal")
+
+    candidates = make_candidates(args.candidates, args.seed)
+    levels = []
+    for concurrency in args.concurrency:
+        result = run_level(candidates, concurrency, args.think_time, args.answer_chars, args.arrival_rate, args.seed)
+        levels.append(result)
+        print(f"c={concurrency:<4} {result['sessions_per_s']:>8.2f} sessions/s  "
+              f"queue p95 {result['queue_delay_p95_ms']:>9.2f} ms  "
+              f"session p95 {result['session_p95_ms']:>9.2f} ms  "
+              f"{result['memory_per_session_kb']:>7.1f} KB/session  "
+              f"{result['db_writes_per_s']:>8.1f} writes/s  errors {result['errors']}")
+
+    knee = find_knee(levels)
+    print(f"Throughput stops scaling at concurrency ~{knee}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"levels": levels, "knee_concurrency": knee}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
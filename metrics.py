@@ -0,0 +1,182 @@
+"""
+Metrics module for ASTRA
+Lightweight timing spans and counters for the hot paths (text extraction,
+resume parsing, question generation, LLM calls, database writes), exported in
+the Prometheus text format and optionally as OpenTelemetry spans.
+
+Configuration (read once at import time):
+    ASTRA_METRICS=1         enable collection; when unset `traced` returns the
+                            original function and `span`/`inc` are no-ops
+    ASTRA_METRICS_PORT=9464 also serve /metrics over HTTP from this process
+    ASTRA_OTEL=1            additionally emit OpenTelemetry spans (needs
+                            opentelemetry-api / -sdk installed and configured)
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ASTRA_METRICS", "0").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds in seconds (LLM calls dominate, so the tail is long)
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> [bucket counts..., count, sum]
+_counters = {}    # (name, labels) -> value
+_gauges = {}      # (name, labels) -> value
+
+_tracer = None
+if ENABLED and os.getenv("ASTRA_OTEL", "0").lower() in ("1", "true", "yes"):
+    try:
+        from opentelemetry import trace
+        _tracer = trace.get_tracer("astra")
+    except ImportError:
+        _tracer = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def observe(name, seconds, **labels):
+    """Record one duration sample in the `name` histogram"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * len(BUCKETS) + [0, 0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += seconds
+
+def inc(name, value=1, **labels):
+    """Add `value` to the `name` counter"""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def gauge(name, value, **labels):
+    """Set the `name` gauge to `value`"""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+@contextmanager
+def _span(name, labels):
+    otel = _tracer.start_as_current_span(name, attributes=labels) if _tracer else nullcontext()
+    start = time.perf_counter()
+    try:
+        with otel:
+            yield
+    except Exception:
+        inc("astra_span_errors_total", span=name, **labels)
+        raise
+    finally:
+        observe("astra_span_duration_seconds", time.perf_counter() - start, span=name, **labels)
+
+def span(name, **labels):
+    """Context manager timing a block as span `name`"""
+    if not ENABLED:
+        return nullcontext()
+    return _span(name, labels)
+
+def traced(name=None, **labels):
+    """Decorator timing every call of a function (a no-op unless ENABLED)"""
+    def decorator(func):
+        if not ENABLED:
+            return func
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _span(span_name, labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ------------------ Export ------------------
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+def render_prometheus():
+    """Current metrics in the Prometheus text exposition format"""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    typed = set()
+    for (name, labels), hist in sorted(histograms.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for bound, count in zip(BUCKETS, hist):
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist[-2]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist[-2]}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist[-1]:.6f}")
+    for (name, labels), value in sorted(counters.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), value in sorted(gauges.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} gauge")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """Drop all collected metrics"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port):
+    """Serve /metrics from a daemon thread"""
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if ENABLED and os.getenv("ASTRA_METRICS_PORT"):
+    try:
+        start_metrics_server(int(os.getenv("ASTRA_METRICS_PORT")))
+    except OSError as e:
+        # Another process (e.g. a second uvicorn worker) already owns the port
+        logger.warning("Metrics server not started: %s", e)
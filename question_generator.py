@@ -1,9 +1,51 @@
 from typing import List, Dict, Any
+import logging
 import random
-from llm_loader import get_llm
+import re
+from ledger import BudgetExceeded
+from llm_loader import get_task_llm
+from metrics import inc, traced
+from response_cache import normalize, project_key, question_cache, skill_key
 
-llm = get_llm("gemini")
+logger = logging.getLogger(__name__)
 
+# Served when a token budget is used up and nothing similar is cached
+CANNED_QUESTIONS = {
+    "tech": [
+        "Which technology in your stack do you know best, and what is a hard problem you solved with it?",
+        "How do you decide between two tools or libraries that solve the same problem?",
+    ],
+    "project": [
+        "Walk me through the architecture of one of your projects and the trade-offs you made.",
+        "What was the hardest bug or challenge in that project, and how did you resolve it?",
+    ],
+    "job": [
+        "Tell me about a time you had to learn something new quickly to deliver on a task.",
+        "How do you handle disagreements about technical decisions within a team?",
+    ],
+}
+
+def _ask_for_questions(task: str, prompt: str) -> List[str]:
+    """Invoke the task's routed LLM and return up to 2 questions from its numbered list"""
+    response = get_task_llm(task).invoke(prompt)
+    # Handle both string responses and objects with 'content' attribute
+    response_text = response.content if hasattr(response, "content") else str(response)
+    
+    # Extract questions from the response
+    questions = [line.strip() for line in response_text.split("\n") 
+                if line.strip() and not line.strip().isdigit() and len(line) > 10]
+    return questions[:2]  # Return maximum 2 questions
+
+def _cached_questions(kind: str, key: str, task: str, prompt: str) -> List[str]:
+    """Questions from the response cache or the LLM; over budget, near-duplicate cached or canned ones"""
+    try:
+        return list(question_cache.get_or_create(kind, key, lambda: _ask_for_questions(task, prompt)))
+    except BudgetExceeded as e:
+        logger.warning("%s; serving cached or canned %s questions", e, kind)
+        inc("astra_llm_budget_fallbacks_total", task=task)
+        return list(question_cache.nearest(kind, key) or CANNED_QUESTIONS[kind])
+
+@traced()
 def generate_tech_questions(candidate: Dict[str, Any]) -> List[str]:
     """Generate questions about the candidate's technical skills"""
     # Get the candidate's tech stack
@@ -13,8 +55,8 @@ def generate_tech_questions(candidate: Dict[str, Any]) -> List[str]:
     if not tech_stack:
         return ["Tell me about your technical skills and proficiencies."]
     
-    # Randomly select up to 2 technologies
-    selected_techs = random.sample(candidate["tech_stack"], min(2, len(candidate["tech_stack"])))
+    # Randomly select up to 2 technologies (sorted, so the same pair always builds the same prompt)
+    selected_techs = sorted(random.sample(candidate["tech_stack"], min(2, len(candidate["tech_stack"]))), key=normalize)
     
     # Generate questions about these technologies
     prompt = f"""
@@ -23,15 +65,10 @@ def generate_tech_questions(candidate: Dict[str, Any]) -> List[str]:
     Return only a numbered list of questions.
     """
     
-    response = llm.invoke(prompt)
-    # Handle both string responses and objects with 'content' attribute
-    response_text = response.content if hasattr(response, "content") else str(response)
-    
-    # Extract questions from the response
-    questions = [line.strip() for line in response_text.split("\n") 
-                if line.strip() and not line.strip().isdigit() and len(line) > 10]
-    return questions[:2]  # Return maximum 2 questions
+    # Candidates sharing the same skills (in any order or case) share the answer
+    return _cached_questions("tech", skill_key(selected_techs), "tech_questions", prompt)
 
+@traced()
 def generate_project_questions(candidate: Dict[str, Any]) -> List[str]:
     """Generate questions about the candidate's projects"""
     # Get the candidate's projects
@@ -41,8 +78,8 @@ def generate_project_questions(candidate: Dict[str, Any]) -> List[str]:
     if not projects:
         return ["Tell me about a significant project you've worked on."]
     
-    # Randomly select up to 2 projects
-    selected_projects = random.sample(projects, min(2, len(projects)))
+    # Randomly select up to 2 projects (in fingerprint order, so the prompt doesn't depend on sampling order)
+    selected_projects = sorted(random.sample(projects, min(2, len(projects))), key=lambda p: project_key([p]))
     
     # Build prompt with project details
     project_details = []
@@ -63,15 +100,9 @@ def generate_project_questions(candidate: Dict[str, Any]) -> List[str]:
     Return only a numbered list of questions, one question per project.
     """
     
-    response = llm.invoke(prompt)
-    # Handle both string responses and objects with 'content' attribute
-    response_text = response.content if hasattr(response, "content") else str(response)
-    
-    # Extract questions from the response
-    questions = [line.strip() for line in response_text.split("\n") 
-                if line.strip() and not line.strip().isdigit() and len(line) > 10]
-    return questions[:2]  # Return maximum 2 questions
+    return _cached_questions("project", project_key(selected_projects), "project_questions", prompt)
 
+@traced()
 def generate_job_questions(job_role: str) -> List[str]:
     """Generate job-specific questions"""
     prompt = f"""
@@ -79,11 +110,24 @@ def generate_job_questions(job_role: str) -> List[str]:
     These should be general professional questions not related to specific technologies.
     Return only a numbered list of questions.
     """
-    response = llm.invoke(prompt)
-    # Handle both string responses and objects with 'content' attribute
+    return _cached_questions("job", normalize(job_role), "job_questions", prompt)
+
+@traced()
+def evaluate_answer(question: str, answer: str) -> int:
+    """Rate a candidate's answer from 1 to 5 (0 if the model gives no usable rating)"""
+    prompt = f"""
+    You are evaluating a candidate's answer in a technical screening interview.
+    Question: {question}
+    Answer: {answer}
+    Rate the answer from 1 (poor) to 5 (excellent) for accuracy and completeness.
+    Return only the number.
+    """
+    try:
+        response = get_task_llm("evaluation").invoke(prompt)
+    except BudgetExceeded as e:
+        logger.warning("%s; answer left unrated", e)
+        return 0
     response_text = response.content if hasattr(response, "content") else str(response)
-    
-    # Extract questions from the response
-    questions = [line.strip() for line in response_text.split("\n") 
-                if line.strip() and not line.strip().isdigit() and len(line) > 10]
-    return questions[:2]  # Return maximum 2 questions
\ No newline at end of file
+
+    match = re.search(r"[1-5]", response_text)
+    return int(match.group(0)) if match else 0
@@ -0,0 +1,174 @@
+"""
+Response cache for ASTRA
+Caches LLM answers for question-generation prompts. Prompt inputs are
+canonicalized first (skill sets sorted and normalized, projects reduced to a
+fingerprint), so "Python, Django" and "Django, Python" share one entry. On an
+exact miss, a TF-IDF cosine lookup over the cached inputs of the same kind can
+return a near-duplicate's answer when the similarity reaches the threshold.
+
+Configuration:
+    ASTRA_RESPONSE_CACHE=0                 disable the cache
+    ASTRA_RESPONSE_CACHE_SIZE=1024         entries kept (least recently used evicted)
+    ASTRA_RESPONSE_CACHE_THRESHOLD=0.9     cosine similarity for a near-duplicate hit (1 = exact only)
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from metrics import gauge, inc
+
+ENABLED = os.getenv("ASTRA_RESPONSE_CACHE", "1").lower() in ("1", "true", "yes")
+MAX_ENTRIES = int(os.getenv("ASTRA_RESPONSE_CACHE_SIZE", "1024"))
+SIMILARITY_THRESHOLD = float(os.getenv("ASTRA_RESPONSE_CACHE_THRESHOLD", "0.9"))
+
+_TOKEN = re.compile(r"[a-z0-9+#.]+")
+
+
+# ------------------ Canonical inputs ------------------
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace"""
+    return " ".join(str(text).lower().split())
+
+def skill_key(skills) -> str:
+    """Order- and case-insensitive key for a set of skills"""
+    return ", ".join(sorted({normalize(s) for s in skills if str(s).strip()}))
+
+def project_key(projects) -> str:
+    """Order-insensitive fingerprint of projects: name, technologies and a description hash"""
+    parts = []
+    for project in projects:
+        description = normalize(project.get("description") or "")
+        parts.append("{} [{}] {}".format(
+            normalize(project.get("name") or ""),
+            skill_key(project.get("technologies") or []),
+            hashlib.sha1(description.encode("utf-8")).hexdigest()[:8],
+        ))
+    return " | ".join(sorted(parts))
+
+
+# ------------------ Cache ------------------
+def _tokens(text: str) -> Counter:
+    return Counter(_TOKEN.findall(text.lower()))
+
+class ResponseCache:
+    """Thread-safe LRU of (kind, canonical input) -> response with TF-IDF similarity lookup"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, threshold=SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (kind, key) -> (response, term counts)
+        self._doc_freq = {}            # kind -> Counter of term -> entries containing it
+        self._kind_sizes = Counter()   # kind -> entries
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def _vector(self, kind, terms):
+        df = self._doc_freq.get(kind, {})
+        n = self._kind_sizes[kind] + 1
+        return {t: c * (math.log(n / (1 + df.get(t, 0))) + 1.0) for t, c in terms.items()}
+
+    @staticmethod
+    def _cosine(a, b):
+        dot = sum(w * b.get(t, 0.0) for t, w in a.items())
+        if not dot:
+            return 0.0
+        return dot / (math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values())))
+
+    def _similar(self, kind, terms, threshold):
+        # Caller holds the lock. Linear scan: the cache is small and bounded.
+        query = self._vector(kind, terms)
+        best, best_score = None, 0.0
+        for (k, _), (response, entry_terms) in self._entries.items():
+            if k != kind:
+                continue
+            score = self._cosine(query, self._vector(kind, entry_terms))
+            if score > best_score:
+                best, best_score = response, score
+        return best if best_score >= threshold else None
+
+    def get(self, kind, key):
+        """Cached response for an exact or near-duplicate input, or None"""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None:
+                self._entries.move_to_end((kind, key))
+                result = "hit"
+                response = entry[0]
+            elif self.threshold < 1.0:
+                response = self._similar(kind, _tokens(key), self.threshold)
+                result = "similar_hit" if response is not None else "miss"
+            else:
+                response, result = None, "miss"
+            self._stats[result] += 1
+        inc("astra_cache_requests_total", cache="response", kind=kind, result=result)
+        return response
+
+    def nearest(self, kind, key):
+        """
+        Exact or near-duplicate (similarity >= threshold) cached response, or
+        None. Unlike get() it is not counted as a hit or miss; callers use it as
+        a fallback, so an unrelated candidate's answer is never returned.
+        """
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None:
+                return entry[0]
+            if self.threshold >= 1.0:
+                return None
+            return self._similar(kind, _tokens(key), self.threshold)
+
+    def put(self, kind, key, response):
+        terms = _tokens(key)
+        with self._lock:
+            if (kind, key) in self._entries:
+                self._entries.move_to_end((kind, key))
+                return
+            self._entries[(kind, key)] = (response, terms)
+            self._doc_freq.setdefault(kind, Counter()).update(terms.keys())
+            self._kind_sizes[kind] += 1
+            while len(self._entries) > self.max_entries:
+                (old_kind, _), (_, old_terms) = self._entries.popitem(last=False)
+                doc_freq = self._doc_freq[old_kind]
+                doc_freq.subtract(old_terms.keys())
+                # Counter.subtract keeps zero counts; drop them or unique terms accumulate forever
+                for term in old_terms:
+                    if doc_freq[term] <= 0:
+                        del doc_freq[term]
+                self._kind_sizes[old_kind] -= 1
+                self._stats["evictions"] += 1
+            size = len(self._entries)
+        gauge("astra_response_cache_entries", size)
+
+    def get_or_create(self, kind, key, create):
+        """Return the cached response for (kind, key), calling create() on a miss"""
+        if not ENABLED:
+            return create()
+        response = self.get(kind, key)
+        if response is None:
+            response = create()
+            if response:
+                self.put(kind, key, response)
+        return response
+
+    def stats(self):
+        """Hit / miss counts, hit rate and size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats.get("hit", 0) + stats.get("similar_hit", 0) + stats.get("miss", 0)
+        stats["hit_rate"] = round((stats.get("hit", 0) + stats.get("similar_hit", 0)) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._doc_freq.clear()
+            self._kind_sizes.clear()
+            self._stats.clear()
+
+
+question_cache = ResponseCache()
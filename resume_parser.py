@@ -1,10 +1,14 @@
 # resume_parser.py
 import os
 import json
+import hashlib
+import logging
 from typing import List, Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel, EmailStr, conint, ValidationError
-from llm_loader import get_llm, get_watsonx_llm, get_gemini_llm
+from llm_loader import get_task_llm
+from metrics import inc, traced
+from structured_output import FieldValidator, collect_fields, gemini_response_schema, subschema
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain.schema import BaseOutputParser, OutputParserException
@@ -12,6 +16,8 @@ from langchain.schema import BaseOutputParser, OutputParserException
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # ------------------ Schema ------------------
 class Project(BaseModel):
     name: str
@@ -38,74 +44,130 @@ class JSONOutputParser(BaseOutputParser):
             raise OutputParserException(f"Invalid JSON: {e}")
 
 
+# ------------------ Validation ------------------
+validator = FieldValidator(CandidateData)
+CANDIDATE_SCHEMA = gemini_response_schema(CandidateData)
+
+# How many times the model may be re-asked for fields that are missing or invalid
+MAX_REASKS = 1
+
+
 # ------------------ LLM Setup ------------------
-def get_parser_llm(provider="gemini"):
-    """Get the appropriate LLM for resume parsing"""
-    if provider == "watsonx":
-        return get_watsonx_llm(model_id="ibm/granite-13b-instruct-v2")
-    else:
-        return get_gemini_llm(model_name="gemini-1.5-flash", temperature=0)
+def get_parser_llm(provider="gemini", fields=None):
+    """
+    Get the appropriate LLM for resume parsing, constrained to CandidateData (or just `fields`) where supported.
+
+    The full parse carries PARSE_INSTRUCTIONS as a static system prompt, so each
+    request only sends the resume; field re-asks use the self-contained field_prompt.
+    """
+    system_prompt = PARSE_INSTRUCTIONS if fields is None else None
+    schema = CANDIDATE_SCHEMA if fields is None else subschema(CANDIDATE_SCHEMA, fields)
+    # Model, token limit and latency SLO come from the "parse" (or "parse_watsonx") route in
+    # llm_loader.ROUTES; either way calls are budgeted and recorded in the ledger. watsonx
+    # ignores the schema and gets the system prompt as a system message.
+    task = "parse_watsonx" if provider == "watsonx" else "parse"
+    return get_task_llm(task, response_schema=schema, system_prompt=system_prompt)
 
 
 # ------------------ Prompt ------------------
 parser = JSONOutputParser()
 
+# Static part of the parse prompt, built once and sent as the model's system
+# prompt (cached context where the provider supports it)
+PARSE_INSTRUCTIONS = (
+    "You are a resume parser. Extract structured information from the resume text you are given. "
+    "Return valid JSON with the following schema:\n\n"
+    "{\n"
+    '  "name": "Full Name",\n'
+    '  "email": "email@example.com",\n'
+    '  "phone": "+1234567890",\n'
+    '  "location": "City, Country",\n'
+    '  "years_experience": 5,\n'
+    '  "tech_stack": ["Python","Django","Docker"],\n'
+    '  "desired_positions": ["Backend Engineer"],\n'
+    '  "projects": [\n'
+    "      {\n"
+    '         "name": "Project Name",\n'
+    '         "description": "Brief description of the project",\n'
+    '         "technologies": ["Python","React"]\n'
+    "      }\n"
+    "   ]\n"
+    "}"
+)
+
+# Variable part: the only text sent with each parse request
 prompt = PromptTemplate(
     input_variables=["resume_text"],
+    template="Resume:\n{resume_text}\n\nOutput ONLY the JSON."
+)
+
+# Example values shown when re-asking for individual fields
+FIELD_EXAMPLES = {
+    "name": "Full Name",
+    "email": "email@example.com",
+    "phone": "+1234567890",
+    "location": "City, Country",
+    "years_experience": 5,
+    "tech_stack": ["Python", "Django", "Docker"],
+    "desired_positions": ["Backend Engineer"],
+    "projects": [{"name": "Project Name", "description": "Brief description of the project", "technologies": ["Python", "React"]}],
+}
+
+field_prompt = PromptTemplate(
+    input_variables=["fields", "resume_text"],
     template=(
-        "You are a resume parser. Extract structured information from the following text. "
-        "Return valid JSON with the following schema:\n\n"
-        "{{\n"
-        '  "name": "Full Name",\n'
-        '  "email": "email@example.com",\n'
-        '  "phone": "+1234567890",\n'
-        '  "location": "City, Country",\n'
-        '  "years_experience": 5,\n'
-        '  "tech_stack": ["Python","Django","Docker"],\n'
-        '  "desired_positions": ["Backend Engineer"],\n'
-        '  "projects": [\n'
-        "      {{\n"
-        '         "name": "Project Name",\n'
-        '         "description": "Brief description of the project",\n'
-        '         "technologies": ["Python","React"]\n'
-        "      }}\n"
-        "   ]\n"
-        "}}\n\n"
+        "You are a resume parser. Extract ONLY the following fields from the text "
+        "and return them as valid JSON with this schema:\n\n"
+        "{fields}\n\n"
         "Resume:\n{resume_text}\n\n"
         "Output ONLY the JSON."
     )
 )
 
 
+# Changes whenever the prompts or schema change; stored on each candidate so
+# resume_store.backfill_stale() can find records produced by an older parser
+PARSER_VERSION = hashlib.sha256(
+    (PARSE_INSTRUCTIONS + prompt.template + field_prompt.template + json.dumps(CandidateData.model_json_schema(), sort_keys=True)).encode("utf-8")
+).hexdigest()[:12]
+
+
 # ------------------ Chain ------------------
 chain = prompt | get_parser_llm()
 
 # chain = prompt | GeminiLLM(model_name="gemini-1.5-flash", temperature=0)
 
+def _stream_text(runnable, inputs):
+    """Yield the text of each streamed chunk (plain strings for LLMs, .content for chat models)"""
+    for chunk in runnable.stream(inputs):
+        yield chunk.content if hasattr(chunk, "content") else str(chunk)
+
+@traced()
 def parse_resume_to_json(resume_text: str) -> CandidateData:
     """
-    Parse resume text into CandidateData via Watsonx + validation.
-    """
-    raw_output = chain.invoke({"resume_text": resume_text}) # for gemini based response
-    # raw_output = chain.invoke({"resume_text": resume_text}).content # for watsonx based response
-
-    # Extract the content string from the AIMessage
-    if hasattr(raw_output, "content"):
-        output_text = raw_output.content
-    else:
-        output_text = str(raw_output)
-
-    import re
-    json_match = re.search(r'(\{.*\})', output_text, re.DOTALL)
-    if json_match:
-        clean_json = json_match.group(1)
-        try:
-            data = json.loads(clean_json)
-            return CandidateData(**data)
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse extracted JSON: {e}")
+    Parse resume text into CandidateData.
 
-    return CandidateData(**data)
+    The model output is parsed as it streams and each field is validated as
+    soon as it is complete. Malformed JSON is repaired locally; fields that are
+    still missing or invalid are re-requested on their own (up to MAX_REASKS
+    times) instead of repeating the whole parse.
+    """
+    fields, errors = {}, {}
+    collect_fields(validator, _stream_text(chain, {"resume_text": resume_text}), fields, errors)
+
+    for _ in range(MAX_REASKS):
+        broken = [name for name in CandidateData.model_fields
+                  if name in errors or (name in validator.required and name not in fields)]
+        if not broken:
+            break
+        logger.info("Re-asking resume parser for fields: %s", broken)
+        inc("astra_resume_parse_reasks_total")
+        field_chain = field_prompt | get_parser_llm(fields=broken)
+        example = json.dumps({name: FIELD_EXAMPLES[name] for name in broken}, indent=2)
+        collect_fields(validator, _stream_text(field_chain, {"fields": example, "resume_text": resume_text}), fields, errors)
+
+    # Raises ValidationError naming any field that is still missing or invalid
+    return CandidateData(**fields)
 
 # testing the function with sample
 resume_text = """Mohammad Ammar/ 
@@ -0,0 +1,171 @@
+"""
+Resume store for ASTRA
+Content-addressed storage for raw resume uploads and their extracted text on
+the local filesystem, compressed with zstd (zlib when zstandard isn't
+installed). Candidate documents reference their resume by SHA-256 and record
+the parser version that produced them, so a change to the resume_parser prompt
+or schema can be backfilled by re-parsing stored text instead of asking
+candidates to upload again.
+
+Backfill stale candidates with:
+    python resume_store.py backfill --batch-size 100 --concurrency 4
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = os.getenv("ASTRA_RESUME_STORE", "resume_store")
+
+
+# ------------------ Compression ------------------
+def _compress(data: bytes):
+    """Return (compressed bytes, file extension)"""
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), ".zst"
+    return zlib.compress(data, 9), ".z"
+
+def _decompress(data: bytes, ext: str) -> bytes:
+    if ext == ".zst":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst resume blobs (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+# ------------------ Blob files ------------------
+def _path(sha: str, kind: str) -> str:
+    return os.path.join(STORE_DIR, sha[:2], sha[2:4], f"{sha}.{kind}")
+
+def _write(sha: str, kind: str, data: bytes) -> None:
+    base = _path(sha, kind)
+    if os.path.exists(base + ".zst") or os.path.exists(base + ".z"):
+        return  # content-addressed: already stored
+    payload, ext = _compress(data)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    # Write to a temp file and rename so readers never see a partial blob
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(base))
+    with os.fdopen(fd, "wb") as f:
+        f.write(payload)
+    os.replace(tmp, base + ext)
+
+def _read(sha: str, kind: str):
+    base = _path(sha, kind)
+    for ext in (".zst", ".z"):
+        if os.path.exists(base + ext):
+            with open(base + ext, "rb") as f:
+                return _decompress(f.read(), ext)
+    return None
+
+def resume_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def put_resume(data: bytes, text: str = None) -> str:
+    """Store an upload (and its extracted text) and return its SHA-256"""
+    sha = resume_sha256(data)
+    _write(sha, "raw", data)
+    if text is not None:
+        _write(sha, "txt", text.encode("utf-8"))
+    return sha
+
+def get_raw(sha: str):
+    """Original upload bytes, or None"""
+    return _read(sha, "raw")
+
+def get_text(sha: str):
+    """Extracted text, or None"""
+    data = _read(sha, "txt")
+    return data.decode("utf-8") if data is not None else None
+
+
+# ------------------ Backfill ------------------
+def _reparse(doc):
+    from resume_parser import parse_resume_to_json
+
+    text = get_text(doc["resume_sha256"])
+    if text is None:
+        return doc["_id"], None, "stored text not found"
+    try:
+        return doc["_id"], parse_resume_to_json(text), None
+    except Exception as e:
+        return doc["_id"], None, str(e)
+
+def backfill_stale(batch_size=100, concurrency=4, limit=None, dry_run=False):
+    """
+    Re-parse candidates whose parser_version is not the current PARSER_VERSION,
+    reading stored resume text and writing results back with bulk updates.
+    Returns counts of updated and failed candidates; with dry_run nothing is
+    written and re-parsed candidates are counted as "would_update" instead.
+    """
+    from pymongo import UpdateOne
+    from db_utils import candidates_col
+    from resume_parser import PARSER_VERSION
+
+    query = {"resume_sha256": {"$exists": True}, "parser_version": {"$ne": PARSER_VERSION}}
+    # Whole documents: parsed_update compares current fields with parsed_hashes
+    cursor = candidates_col.find(query, batch_size=batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    updated = failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                u, f = _backfill_batch(pool, batch, candidates_col, UpdateOne, PARSER_VERSION, dry_run)
+                updated, failed = updated + u, failed + f
+                batch = []
+        if batch:
+            u, f = _backfill_batch(pool, batch, candidates_col, UpdateOne, PARSER_VERSION, dry_run)
+            updated, failed = updated + u, failed + f
+    return {"would_update" if dry_run else "updated": updated, "failed": failed, "parser_version": PARSER_VERSION}
+
+def _backfill_batch(pool, batch, candidates_col, UpdateOne, parser_version, dry_run):
+    from db_utils import parsed_update
+
+    docs = {doc["_id"]: doc for doc in batch}
+    ops, failed = [], 0
+    for doc_id, candidate, error in pool.map(_reparse, batch):
+        if candidate is None:
+            logger.warning("Backfill: could not re-parse candidate %s: %s", doc_id, error)
+            failed += 1
+            continue
+        # The version guard keeps a concurrent backfill from overwriting a newer parse
+        ops.append(UpdateOne(
+            {"_id": doc_id, "parser_version": {"$ne": parser_version}},
+            # email and hand-edited fields are kept
+            {"$set": {**parsed_update(docs[doc_id], candidate), "parser_version": parser_version}},
+        ))
+    if ops and not dry_run:
+        candidates_col.bulk_write(ops, ordered=False)
+        inc("astra_backfill_reparsed_total", len(ops))
+    inc("astra_backfill_failed_total", failed)
+    return len(ops), failed
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ASTRA resume store")
+    sub = ap.add_subparsers(dest="command", required=True)
+    bf = sub.add_parser("backfill", help="Re-parse candidates produced by an older parser version")
+    bf.add_argument("--batch-size", type=int, default=100)
+    bf.add_argument("--concurrency", type=int, default=4, help="Parallel LLM parses")
+    bf.add_argument("--limit", type=int, help="Stop after this many candidates")
+    bf.add_argument("--dry-run", action="store_true", help="Parse but don't write")
+    args = ap.parse_args()
+
+    if args.command == "backfill":
+        print(backfill_stale(args.batch_size, args.concurrency, args.limit, args.dry_run))
@@ -0,0 +1,200 @@
+"""
+Retention for ASTRA
+Keeps responses / evaluated_responses small so their indexes and working set
+stay in the database cache as history grows:
+
+1. Indexes: candidate_id + timestamp on both collections, plus a TTL index
+   that expires raw responses ASTRA_RESPONSE_TTL_DAYS after their timestamp
+   once they are flagged evaluated (the evaluated copy keeps the answer).
+2. Bucketing: once a candidate has been inactive for ASTRA_COMPACT_AFTER_HOURS
+   their interview is compacted into one interview_buckets document and the
+   per-answer documents are deleted. Answers keep their _id inside the bucket,
+   and `compacted_answers` unwinds them back into documents, so analytics
+   refreshes and incremental exports still see them.
+3. Archival: buckets older than ASTRA_ARCHIVE_AFTER_DAYS are appended to
+   gzip-compressed monthly NDJSON files under ASTRA_ARCHIVE_DIR and removed.
+
+Run periodically (e.g. hourly from cron):
+    python retention.py run
+"""
+
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, ReplaceOne
+
+from db_utils import evaluated_responses_col, interview_buckets_col, llm_ledger_col, responses_col
+from metrics import inc, traced
+
+RESPONSE_TTL_DAYS = int(os.getenv("ASTRA_RESPONSE_TTL_DAYS", "30"))
+COMPACT_AFTER_HOURS = int(os.getenv("ASTRA_COMPACT_AFTER_HOURS", "24"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ASTRA_ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_DIR = os.getenv("ASTRA_ARCHIVE_DIR", "archive")
+BATCH_SIZE = 200
+
+
+# ------------------ Indexes ------------------
+def ensure_indexes():
+    """Create the read indexes (including the LLM ledger's) and the TTL index (idempotent)"""
+    responses_col.create_index([("candidate_id", ASCENDING), ("timestamp", ASCENDING)])
+    evaluated_responses_col.create_index([("candidate_id", ASCENDING), ("timestamp", ASCENDING)])
+    # Evaluated raw responses expire RESPONSE_TTL_DAYS after their timestamp; unevaluated ones wait for compaction
+    responses_col.create_index(
+        [("timestamp", ASCENDING)],
+        name="timestamp_ttl_evaluated",
+        expireAfterSeconds=RESPONSE_TTL_DAYS * 86400,
+        partialFilterExpression={"evaluated": True},
+    )
+    interview_buckets_col.create_index([("candidate_id", ASCENDING), ("started", ASCENDING)])
+    interview_buckets_col.create_index([("ended", ASCENDING)])
+    interview_buckets_col.create_index([("last_id", ASCENDING)])
+    # ledger.check_budget / usage / reassign look entries up by subject
+    llm_ledger_col.create_index([("subject", ASCENDING)])
+
+
+# ------------------ Bucketing ------------------
+def _idle_candidates(cutoff, limit):
+    """candidate_ids whose newest raw response or evaluation is older than cutoff"""
+    pipeline = [
+        {"$group": {"_id": "$candidate_id", "last": {"$max": "$timestamp"}}},
+        {"$match": {"last": {"$lt": cutoff}}},
+        {"$limit": limit},
+    ]
+    idle = {doc["_id"] for doc in responses_col.aggregate(pipeline, allowDiskUse=True)}
+    idle |= {doc["_id"] for doc in evaluated_responses_col.aggregate(pipeline, allowDiskUse=True)}
+    return idle
+
+def _bucket(candidate_id, responses, evaluations):
+    docs = responses + evaluations
+    started = min(d["timestamp"] for d in docs)
+    first_id = min(d["_id"] for d in docs)
+    # Answers keep their _id so exports can resume past them (see compacted_answers)
+    strip = lambda d: {k: v for k, v in d.items() if k not in ("candidate_id", "evaluated")}
+    return {
+        # Deterministic id: re-running after a crash replaces the bucket instead of duplicating it
+        "_id": f"{candidate_id}:{first_id}",
+        "candidate_id": candidate_id,
+        "started": started,
+        "ended": max(d["timestamp"] for d in docs),
+        "last_id": max(d["_id"] for d in docs),
+        "responses": [strip(d) for d in responses],
+        "evaluations": [strip(d) for d in evaluations],
+    }
+
+@traced("retention.compact")
+def compact(older_than_hours=COMPACT_AFTER_HOURS, limit=1000):
+    """Compact the answers of up to `limit` idle candidates into interview buckets"""
+    cutoff = datetime.now() - timedelta(hours=older_than_hours)
+    ids = list(_idle_candidates(cutoff, limit))
+    compacted = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        responses, evaluations = {}, {}
+        for doc in responses_col.find({"candidate_id": {"$in": batch}}).sort("timestamp", 1):
+            responses.setdefault(doc["candidate_id"], []).append(doc)
+        for doc in evaluated_responses_col.find({"candidate_id": {"$in": batch}}).sort("timestamp", 1):
+            evaluations.setdefault(doc["candidate_id"], []).append(doc)
+
+        ops, response_ids, evaluation_ids = [], [], []
+        for cid in batch:
+            rs, es = responses.get(cid, []), evaluations.get(cid, [])
+            # Skip candidates who answered again since _idle_candidates ran
+            if not (rs or es) or max(d["timestamp"] for d in rs + es) >= cutoff:
+                continue
+            bucket = _bucket(cid, rs, es)
+            ops.append(ReplaceOne({"_id": bucket["_id"]}, bucket, upsert=True))
+            response_ids += [d["_id"] for d in rs]
+            evaluation_ids += [d["_id"] for d in es]
+        if not ops:
+            continue
+        # Write buckets before deleting, so a failure in between only leaves duplicates
+        # that the next run folds into the same bucket id
+        interview_buckets_col.bulk_write(ops, ordered=False)
+        responses_col.delete_many({"_id": {"$in": response_ids}})
+        evaluated_responses_col.delete_many({"_id": {"$in": evaluation_ids}})
+        compacted += len(ops)
+    inc("astra_retention_buckets_compacted_total", compacted)
+    return compacted
+
+
+# ------------------ Reading ------------------
+def compacted_answers(field, bucket_match=None):
+    """
+    $unionWith stage that adds the answers compacted into interview_buckets
+    (field "responses" or "evaluations") to a pipeline over the matching raw
+    collection, in the same shape as raw documents. `bucket_match` filters
+    buckets before they are unwound (e.g. on ended or last_id). Archived
+    buckets are no longer in the database and are not included.
+    """
+    return {"$unionWith": {"coll": interview_buckets_col.name, "pipeline": [
+        *([{"$match": bucket_match}] if bucket_match else []),
+        {"$unwind": f"${field}"},
+        {"$replaceRoot": {"newRoot": {"$mergeObjects": [f"${field}", {"candidate_id": "$candidate_id"}]}}},
+    ]}}
+
+
+# ------------------ Archival ------------------
+def _archive_path(ended):
+    return os.path.join(ARCHIVE_DIR, f"interview-buckets-{ended:%Y-%m}.ndjson.gz")
+
+@traced("retention.archive")
+def archive(older_than_days=ARCHIVE_AFTER_DAYS):
+    """Move buckets that ended before the cutoff to monthly compressed files"""
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archived = 0
+    cursor = interview_buckets_col.find({"ended": {"$lt": cutoff}}, batch_size=BATCH_SIZE).sort("ended", 1)
+    batch = []
+    for bucket in cursor:
+        batch.append(bucket)
+        if len(batch) >= BATCH_SIZE:
+            archived += _archive_batch(batch)
+            batch = []
+    if batch:
+        archived += _archive_batch(batch)
+    inc("astra_retention_buckets_archived_total", archived)
+    return archived
+
+def _archive_batch(batch):
+    by_file = {}
+    for bucket in batch:
+        by_file.setdefault(_archive_path(bucket["ended"]), []).append(bucket)
+    for path, buckets in by_file.items():
+        # Each append is a new gzip member; gzip.open reads them back as one stream
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for bucket in buckets:
+                f.write(json.dumps(bucket, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    interview_buckets_col.delete_many({"_id": {"$in": [b["_id"] for b in batch]}})
+    return len(batch)
+
+def read_archive(path):
+    """Yield the buckets stored in one archive file"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def run():
+    ensure_indexes()
+    return {"compacted": compact(), "archived": archive()}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ASTRA response retention")
+    ap.add_argument("command", choices=["run", "indexes", "compact", "archive"])
+    args = ap.parse_args()
+
+    if args.command == "run":
+        print(run())
+    elif args.command == "indexes":
+        ensure_indexes()
+        print("Indexes ensured.")
+    elif args.command == "compact":
+        print(f"Compacted {compact()} interview(s).")
+    else:
+        print(f"Archived {archive()} bucket(s).")
@@ -0,0 +1,238 @@
+"""
+Session store for ASTRA
+Compact typed records for per-session interview state, plus one shared,
+size-bounded store for the large values (resume text, interview answers)
+that sessions reference by key. Sessions that go idle have their blobs
+evicted, so memory stays flat no matter how many candidates have come and gone.
+
+Configuration:
+    ASTRA_BLOB_STORE_MB          size budget of the shared blob store (default 256)
+    ASTRA_SESSION_IDLE_SECONDS   idle time before a session's blobs are evicted (default 1800)
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+from metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+MAX_BLOB_BYTES = int(os.getenv("ASTRA_BLOB_STORE_MB", "256")) * 1024 * 1024
+IDLE_TIMEOUT = int(os.getenv("ASTRA_SESSION_IDLE_SECONDS", "1800"))
+# Minimum seconds between idle sweeps (sweeps piggyback on session activity)
+SWEEP_INTERVAL = 60
+
+
+# ------------------ Records ------------------
+@dataclass(slots=True)
+class Answer:
+    question: str
+    answer: str
+    timestamp: float
+
+@dataclass(slots=True)
+class InterviewState:
+    questions: Tuple[str, ...]
+    sections: Tuple[str, ...]
+    time_limit: float
+    answers_key: str
+    current_index: int = 0
+    completed: bool = False
+    start_time: Optional[float] = None
+
+
+# ------------------ Blob store ------------------
+def _approx_size(value: Any) -> int:
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_approx_size(v) for v in value)
+    if isinstance(value, Answer):
+        return sys.getsizeof(value) + sys.getsizeof(value.question) + sys.getsizeof(value.answer)
+    return sys.getsizeof(value)
+
+class BlobStore:
+    """
+    Thread-safe LRU store bounded by the approximate size of its values.
+    Pinned keys (e.g. a live interview's answers) are never evicted to make
+    room; only delete / delete_prefix remove them.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> [value, size]
+        self._pinned = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def pin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.discard(key)
+            self._shrink(keep=None)
+
+    def put(self, key: str, value: Any) -> str:
+        size = _approx_size(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = [value, size]
+            self._bytes += size
+            self._shrink(keep=key)
+        return key
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            self._items.move_to_end(key)
+            return item[0]
+
+    def append(self, key: str, value: Any) -> None:
+        """Append to the list stored at key (creating it if it was never stored or was evicted)"""
+        size = _approx_size(value)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                item = self._items[key] = [[], sys.getsizeof([])]
+                self._bytes += item[1]
+            item[0].append(value)
+            item[1] += size
+            self._bytes += size
+            self._items.move_to_end(key)
+            self._shrink(keep=key)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pinned.discard(key)
+            item = self._items.pop(key, None)
+            if item is not None:
+                self._bytes -= item[1]
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._items if k.startswith(prefix)]
+            for k in keys:
+                self._bytes -= self._items.pop(k)[1]
+            self._pinned = {k for k in self._pinned if not k.startswith(prefix)}
+        return len(keys)
+
+    def _shrink(self, keep: Optional[str]) -> None:
+        # Caller holds the lock. Drop least recently used unpinned values until within budget.
+        if self._bytes <= self.max_bytes:
+            return
+        for key in list(self._items):
+            if self._bytes <= self.max_bytes:
+                break
+            if key == keep or key in self._pinned:
+                continue
+            self._bytes -= self._items.pop(key)[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# ------------------ Sessions ------------------
+class SessionRegistry:
+    """Last-seen times per session, used to evict idle sessions' blobs"""
+
+    def __init__(self, store: BlobStore, idle_timeout: float):
+        self.store = store
+        self.idle_timeout = idle_timeout
+        self._last_seen = {}
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def touch(self, sid: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._last_seen[sid] = now
+            due = now - self._last_sweep >= SWEEP_INTERVAL
+            if due:
+                self._last_sweep = now
+        if due:
+            self.evict_idle(now)
+
+    def evict_idle(self, now: Optional[float] = None) -> list:
+        """Forget sessions idle for longer than idle_timeout and drop their blobs"""
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [sid for sid, seen in self._last_seen.items() if now - seen > self.idle_timeout]
+            for sid in idle:
+                del self._last_seen[sid]
+        for sid in idle:
+            self.store.delete_prefix(f"{sid}:")
+        report = memory_report()
+        if idle:
+            logger.info("Evicted %d idle session(s); memory: %s", len(idle), report)
+        return idle
+
+    def __len__(self) -> int:
+        return len(self._last_seen)
+
+
+blobs = BlobStore(MAX_BLOB_BYTES)
+sessions = SessionRegistry(blobs, IDLE_TIMEOUT)
+
+
+def session_id(state) -> str:
+    """Stable id for a session (st.session_state or any attribute-style state object)"""
+    if "session_key" not in state:
+        state.session_key = uuid.uuid4().hex
+    return state.session_key
+
+def blob_key(state, name: str) -> str:
+    """Key for one of this session's blobs, e.g. blob_key(st.session_state, "resume_text")"""
+    return f"{session_id(state)}:{name}"
+
+def touch(state) -> None:
+    """Mark the session active (call once per script / fragment run)"""
+    sessions.touch(session_id(state))
+
+
+# ------------------ Memory reporting ------------------
+def current_rss_bytes() -> int:
+    """Resident set size of this process (peak RSS where the current value isn't available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+def memory_report() -> dict:
+    """RSS, active sessions, RSS per session and blob store usage; also published as gauges"""
+    rss = current_rss_bytes()
+    active = len(sessions)
+    report = {
+        "rss_bytes": rss,
+        "active_sessions": active,
+        "rss_per_session_bytes": rss // active if active else rss,
+        "blob_bytes": blobs.nbytes,
+        "blob_count": len(blobs),
+    }
+    gauge("astra_process_rss_bytes", rss)
+    gauge("astra_active_sessions", active)
+    gauge("astra_rss_per_session_bytes", report["rss_per_session_bytes"])
+    gauge("astra_blob_store_bytes", blobs.nbytes)
+    return report
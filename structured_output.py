@@ -0,0 +1,286 @@
+"""
+Structured output helpers for ASTRA
+Incremental parsing of a JSON object as it streams from the model, local
+repair of common defects in model-produced JSON, and per-field validation
+against a pydantic model so that only broken fields need to be re-requested.
+"""
+
+import json
+from typing import Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+
+# ------------------ Repair ------------------
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_QUOTES = {"“": '"', "”": '"'}
+
+def strip_code_fences(text: str) -> str:
+    """Drop markdown ``` fences (with or without a language tag)"""
+    lines = [l for l in text.strip().splitlines() if not l.strip().startswith("```")]
+    return "\n".join(lines)
+
+def repair_json(text: str) -> str:
+    """
+    Best-effort fix of model-produced JSON: code fences and surrounding prose,
+    curly quotes, trailing commas, Python literals (True/False/None) and
+    output truncated mid-object (open strings and brackets are closed).
+    """
+    text = strip_code_fences(text)
+    for bad, good in _QUOTES.items():
+        text = text.replace(bad, good)
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return _LITERALS.get(text.strip(), text)
+    text = text[min(starts):]
+
+    out, stack = [], []
+    in_string = escape = False
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if in_string:
+            out.append(c)
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+            out.append(c)
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+            out.append(c)
+        elif c in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                break  # ignore anything after the top-level value
+        elif c.isalpha():
+            j = i
+            while j < len(text) and text[j].isalpha():
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    # Close whatever the model left open
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    if stack:
+        tail = "".join(out).rstrip()
+        if tail.endswith(":"):
+            tail += " null"
+        out = [tail]
+        _drop_trailing_comma(out)
+        out.extend(reversed(stack))
+    return "".join(out)
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    text = "".join(out).rstrip()
+    if text.endswith(","):
+        out[:] = [text[:-1]]
+
+def loads_lenient(text: str) -> Any:
+    """json.loads, falling back to repair_json; raises ValueError if both fail"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(text))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Unrepairable JSON: {e}") from e
+
+
+# ------------------ Incremental parsing ------------------
+class IncrementalObjectParser:
+    """
+    Feed chunks of a streamed top-level JSON object and get back each
+    (key, raw value text) pair as soon as that member is complete, so fields
+    can be validated while the rest of the output is still arriving.
+    Leading prose and code fences before the first "{" are skipped.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"
+        self._key_span = None
+        self._value_start = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self._buf += chunk
+        members = []
+        buf = self._buf
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+            if self.done:
+                break
+            if self._start is None:
+                if c == "{":
+                    self._start = i
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key_str":
+                        self._key_span = (self._key_span[0], i + 1)
+                        self._expect = "colon"
+                continue
+
+            if self._depth == 1 and self._expect == "value" and not c.isspace():
+                self._value_start = i
+                self._expect = "in_value"
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect == "key":
+                    self._key_span = (i, None)
+                    self._expect = "key_str"
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    if self._expect == "in_value":
+                        members.append(self._member(i))
+                    self.done = True
+            elif self._depth == 1 and c == ":" and self._expect == "colon":
+                self._expect = "value"
+            elif self._depth == 1 and c == "," and self._expect == "in_value":
+                members.append(self._member(i))
+                self._expect = "key"
+        self._pos = len(buf)
+        return members
+
+    def _member(self, end: int) -> Tuple[str, str]:
+        key_start, key_end = self._key_span
+        key = json.loads(self._buf[key_start:key_end])
+        return key, self._buf[self._value_start:end].strip()
+
+    @property
+    def text(self) -> str:
+        """Everything from the opening brace on (useful for repairing truncated output)"""
+        return self._buf[self._start:] if self._start is not None else self._buf
+
+
+# ------------------ Validation ------------------
+class FieldValidator:
+    """Validate individual fields of a pydantic model in isolation"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._adapters = {name: TypeAdapter(field.annotation) for name, field in model.model_fields.items()}
+        self.required = [name for name, field in model.model_fields.items() if field.is_required()]
+
+    def validate(self, name: str, value: Any) -> Tuple[bool, Any]:
+        """(True, coerced value) or (False, error message); unknown fields are rejected"""
+        adapter = self._adapters.get(name)
+        if adapter is None:
+            return False, f"Unknown field {name!r}"
+        try:
+            return True, adapter.validate_python(value)
+        except ValidationError as e:
+            return False, str(e)
+
+    def validate_raw(self, name: str, raw: str) -> Tuple[bool, Any]:
+        """Like validate(), but for the raw JSON text of a value"""
+        try:
+            value = loads_lenient(raw)
+        except ValueError as e:
+            return False, str(e)
+        return self.validate(name, value)
+
+
+def collect_fields(validator: FieldValidator, chunks, fields: Dict[str, Any], errors: Dict[str, str]) -> None:
+    """
+    Stream text chunks through an IncrementalObjectParser, validating each
+    member as it completes. Valid values land in `fields`, failures in
+    `errors`. If the object never closes (truncated output) the remainder is
+    repaired and any members not seen yet are validated from that.
+    """
+    parser = IncrementalObjectParser()
+    for chunk in chunks:
+        for name, raw in parser.feed(chunk):
+            _store(validator, name, *validator.validate_raw(name, raw), fields, errors)
+
+    if not parser.done:
+        try:
+            data = loads_lenient(parser.text)
+        except ValueError:
+            return
+        if isinstance(data, dict):
+            for name, value in data.items():
+                if name not in fields:
+                    _store(validator, name, *validator.validate(name, value), fields, errors)
+
+def _store(validator, name, ok, value, fields, errors):
+    if name not in validator.model.model_fields:
+        return
+    if ok:
+        fields[name] = value
+        errors.pop(name, None)
+    else:
+        errors[name] = value
+
+
+# ------------------ Provider schemas ------------------
+_GEMINI_TYPES = {"object": "OBJECT", "array": "ARRAY", "string": "STRING",
+                 "integer": "INTEGER", "number": "NUMBER", "boolean": "BOOLEAN"}
+
+def gemini_response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    Convert a pydantic model into the OpenAPI subset Gemini accepts as
+    `response_schema` (no $ref / anyOf; optional fields become nullable).
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            return convert(defs[node["$ref"].split("/")[-1]])
+        if "anyOf" in node:
+            options = [o for o in node["anyOf"] if o.get("type") != "null"]
+            out = convert(options[0]) if options else {"type": "STRING"}
+            if len(options) < len(node["anyOf"]):
+                out["nullable"] = True
+            return out
+        json_type = node.get("type", "string")
+        out: Dict[str, Any] = {"type": _GEMINI_TYPES.get(json_type, "STRING")}
+        if json_type == "object":
+            out["properties"] = {k: convert(v) for k, v in node.get("properties", {}).items()}
+            if node.get("required"):
+                out["required"] = list(node["required"])
+        elif json_type == "array":
+            out["items"] = convert(node.get("items", {}))
+        return out
+
+    return convert(schema)
+
+def subschema(schema: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Restrict an object schema (from gemini_response_schema) to the given properties"""
+    out = dict(schema)
+    out["properties"] = {k: v for k, v in schema.get("properties", {}).items() if k in fields}
+    out["required"] = [k for k in schema.get("required", []) if k in fields]
+    return out